@@ -1,51 +1,1518 @@
+import argparse
 import asyncio
+import bisect
+import importlib.util
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import socket
+import ssl
+import struct
+import sys
+import tempfile
 import time
-from datetime import datetime
-from playwright.async_api import async_playwright
-import statistics
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from queue import Empty
+from urllib.parse import urljoin, urlsplit
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+TITLE_RE = re.compile(rb'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+TIMING_PHASES = ('dns', 'connect', 'tls', 'ttfb', 'download', 'dom', 'load', 'resources')
+# Failure taxonomy: key -> label, in report order
+ERROR_TYPES = {
+    'dns': 'DNS lookup failed',
+    'connect_refused': 'Connection refused',
+    'connect_reset': 'Connection reset / closed',
+    'connect_failed': 'Connection failed',
+    'tls': 'TLS / certificate error',
+    'navigation_timeout': 'Navigation timeout',
+    'timeout': 'Timeout',
+    'too_many_redirects': 'Too many redirects',
+    'http_4xx': 'HTTP 4xx',
+    'http_5xx': 'HTTP 5xx',
+    'no_response': 'No response',
+    'protocol': 'Malformed response',
+    'browser_crash': 'Browser / page crashed',
+    'other': 'Other',
+}
+# Chromium net errors and Playwright messages, checked in order
+ERROR_PATTERNS = (
+    ('dns', ('ERR_NAME_NOT_RESOLVED', 'ERR_NAME_RESOLUTION_FAILED', 'Name or service not known', 'getaddrinfo')),
+    ('connect_refused', ('ERR_CONNECTION_REFUSED', 'Connection refused', 'Connect call failed')),
+    ('tls', ('ERR_CERT_', 'ERR_SSL_', 'SSL', 'certificate')),
+    ('connect_reset', ('ERR_CONNECTION_RESET', 'ERR_CONNECTION_CLOSED', 'ERR_EMPTY_RESPONSE', 'Connection reset', 'Connection closed')),
+    ('connect_failed', ('ERR_ADDRESS_UNREACHABLE', 'ERR_INTERNET_DISCONNECTED', 'ERR_CONNECTION_FAILED', 'ERR_NETWORK_CHANGED')),
+    ('browser_crash', ('Target crashed', 'Page crashed', 'has been closed', 'Target closed', 'Browser closed',
+                       'Context pool closed')),
+    ('too_many_redirects', ('ERR_TOO_MANY_REDIRECTS', 'Too many redirects')),
+    ('timeout', ('Timeout', 'timed out', 'ERR_TIMED_OUT', 'ERR_CONNECTION_TIMED_OUT')),
+    ('protocol', ('ERR_INVALID_RESPONSE', 'ERR_INVALID_HTTP_RESPONSE', 'ERR_CONTENT_DECODING_FAILED', 'invalid literal')),
+)
+
+# Installed in every bot context before page scripts run (see new_bot_context) so the
+# observers see the whole load: LCP, CLS (largest session window), long tasks with
+# TBT as the time past 50ms of each, and INP as the slowest interaction. They are read
+# at DOMContentLoaded, where LCP/CLS/TBT are cut short, unless page_settle lets the page settle first.
+# The resource timing buffer is raised from its default of 250 entries for the resource index.
+PAGE_INIT_JS = """(() => {
+    performance.setResourceTimingBufferSize(5000);
+    const vitals = window.__botsVitals = { lcp: null, cls: 0, tbt: 0, longTasks: 0, inp: null };
+    const observe = (type, callback, options) => {
+        try {
+            new PerformanceObserver(list => list.getEntries().forEach(callback))
+                .observe(Object.assign({ type, buffered: true }, options));
+        } catch (e) {}
+    };
+    observe('largest-contentful-paint', entry => { vitals.lcp = entry.startTime; });
+    let session = 0, sessionStart = 0, sessionLast = 0;
+    observe('layout-shift', entry => {
+        if (entry.hadRecentInput) return;
+        if (entry.startTime - sessionLast > 1000 || entry.startTime - sessionStart > 5000) {
+            session = 0;
+            sessionStart = entry.startTime;
+        }
+        session += entry.value;
+        sessionLast = entry.startTime;
+        vitals.cls = Math.max(vitals.cls, session);
+    });
+    observe('longtask', entry => {
+        vitals.longTasks += 1;
+        vitals.tbt += Math.max(0, entry.duration - 50);
+    });
+    observe('event', entry => {
+        if (entry.interactionId) vitals.inp = Math.max(vitals.inp || 0, entry.duration);
+    }, { durationThreshold: 16 });
+})()"""
+
+# Title, Navigation Timing phases (ms), the vitals above and the resource entries in one
+# evaluation instead of several CDP round trips
+PAGE_INFO_JS = """() => {
+    const observed = window.__botsVitals;
+    const fcp = performance.getEntriesByName('first-contentful-paint')[0];
+    const vitals = observed ? {
+        fcp: fcp ? fcp.startTime : null,
+        lcp: observed.lcp,
+        cls: observed.cls,
+        tbt: observed.tbt,
+        long_tasks: observed.longTasks,
+        inp: observed.inp,
+        heap_mb: performance.memory ? performance.memory.usedJSHeapSize / 1048576 : null,
+    } : null;
+    const nav = performance.getEntriesByType('navigation')[0];
+    if (!nav) return { title: document.title, timing: null, vitals, resources: [] };
+    let lastResource = 0;
+    const resources = [];
+    for (const entry of performance.getEntriesByType('resource')) {
+        lastResource = Math.max(lastResource, entry.responseEnd);
+        resources.push([entry.name, entry.initiatorType, entry.transferSize, entry.encodedBodySize,
+                        entry.duration, entry.responseStatus || 0]);
+    }
+    const tlsStart = nav.secureConnectionStart > 0 ? nav.secureConnectionStart : nav.connectEnd;
+    return {
+        title: document.title,
+        timing: {
+            dns: nav.domainLookupEnd - nav.domainLookupStart,
+            connect: tlsStart - nav.connectStart,
+            tls: nav.connectEnd - tlsStart,
+            ttfb: nav.responseStart - nav.requestStart,
+            download: nav.responseEnd - nav.responseStart,
+            dom: nav.domContentLoadedEventEnd > 0 ? nav.domContentLoadedEventEnd - nav.responseEnd : null,
+            load: nav.loadEventEnd > 0 ? nav.loadEventEnd - nav.responseEnd : null,
+            resources: lastResource > nav.responseEnd ? lastResource - nav.responseEnd : null,
+        },
+        vitals,
+        resources,
+    };
+}"""
+# Vitals reported in ms by the page, converted to seconds like the timing phases
+VITALS_MS = ('fcp', 'lcp', 'tbt', 'inp')
+# Label, unit and the "good" threshold (web.dev / Lighthouse) of each vital, in report order
+VITALS = {
+    'fcp': ('FCP', 's', 1.8),
+    'lcp': ('LCP', 's', 2.5),
+    'cls': ('CLS', '', 0.1),
+    'inp': ('INP', 's', 0.2),
+    'tbt': ('TBT', 's', 0.2),
+    'long_tasks': ('Long tasks', '', None),
+    'heap_mb': ('JS heap MB', '', None),
+}
+# Upper bounds of the backend TTFB bands LCP is broken down by
+TTFB_BANDS = ((0.1, '<100ms'), (0.3, '100-300ms'), (1.0, '300ms-1s'), (3.0, '1-3s'), (float('inf'), '>3s'))
 
 class ProgressTracker:
-    def __init__(self, total):
+    def __init__(self, total, label=None):
         self.total = total
+        self.prefix = f"[{label}] " if label else ""
         self.completed = 0
-        self.lock = asyncio.Lock()
     
     async def increment(self):
-        async with self.lock:
-            self.completed += 1
-            if self.completed % 10 == 0 or self.completed == self.total:
-                print(f"Progress: {self.completed}/{self.total} ({self.completed/self.total*100:.1f}%)")
+        # Single event loop, so a plain counter is enough; MetricsReporter prints progress
+        self.completed += 1
+
+class LatencyHistogram:
+    """Mergeable log-linear latency histogram (HDR-style) with bounded memory
+
+    Latencies are stored in microseconds, bucketed with 2**sub_bucket_bits sub-buckets per
+    power of two, so every percentile is within ~1% of the exact value whatever the sample count.
+    """
+    def __init__(self, sub_bucket_bits=7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+    
+    def _index(self, micros):
+        shift = max(0, micros.bit_length() - self.sub_bucket_bits)
+        return (shift << self.sub_bucket_bits) + (micros >> shift)
+    
+    def _bucket_value(self, index):
+        shift = index >> self.sub_bucket_bits
+        mantissa = index & ((1 << self.sub_bucket_bits) - 1) if shift else index
+        low = mantissa << shift
+        high = ((mantissa + 1) << shift) - 1
+        return (low + high) / 2 / 1e6
+    
+    def record(self, seconds):
+        index = self._index(max(0, int(seconds * 1e6)))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+    
+    def merge(self, other):
+        """Add another histogram (another worker or time window) into this one"""
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError("Cannot merge histograms with different precision")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+    
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+    
+    def percentile(self, percent):
+        """Latency in seconds at the given percentile (0-100)"""
+        if not self.count:
+            return 0.0
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+    
+    def fraction_at_most(self, seconds):
+        """Approximate share of samples at or under the given value (bucket resolution)"""
+        if not self.count:
+            return 0.0
+        return sum(count for index, count in self.counts.items() if self._bucket_value(index) <= seconds) / self.count
+    
+    def to_dict(self):
+        return {
+            'sub_bucket_bits': self.sub_bucket_bits,
+            'counts': self.counts,
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['sub_bucket_bits'])
+        histogram.counts = {int(index): count for index, count in data['counts'].items()}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+def result_latency(result):
+    """Latency to report for a result
+
+    In open-model runs it counts from the intended send time (coordinated omission),
+    so schedule lag and setup are added to the navigation time.
+    """
+    if 'schedule_lag' in result:
+        return result['elapsed'] + result['schedule_lag'] + result.get('setup_time', 0.0)
+    return result['elapsed']
+
+class TimeWindows:
+    """Requests, errors and latency per wall-clock window with bounded memory
+
+    Windows are width seconds wide and aligned to the epoch, so windows from
+    different workers line up and merge. Once there are more than max_windows,
+    neighbouring windows are folded in pairs and the width doubles, so a run of any
+    length keeps at most max_windows small histograms. Each window also keeps its
+    first and last timestamp so partial windows at the edges of a run report
+    their real rate.
+    """
+    def __init__(self, width=60.0, max_windows=360):
+        self.width = width
+        self.max_windows = max_windows
+        self.windows = {}
+    
+    def _window(self, key):
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = {'requests': 0, 'errors': 0, 'first': None, 'last': None,
+                                          'histogram': LatencyHistogram(sub_bucket_bits=5)}
+        return window
+    
+    def _coarsen(self):
+        windows = self.windows
+        self.windows = {}
+        self.width *= 2
+        for key, window in sorted(windows.items()):
+            self._add(key // 2, window)
+    
+    def _add(self, key, window):
+        merged = self._window(key)
+        merged['requests'] += window['requests']
+        merged['errors'] += window['errors']
+        merged['first'] = window['first'] if merged['first'] is None else min(merged['first'], window['first'])
+        merged['last'] = window['last'] if merged['last'] is None else max(merged['last'], window['last'])
+        merged['histogram'].merge(window['histogram'])
+    
+    def record(self, ts, latency, success):
+        key = int(ts // self.width)
+        if key not in self.windows and len(self.windows) >= self.max_windows:
+            self._coarsen()
+            key = int(ts // self.width)
+        window = self._window(key)
+        window['requests'] += 1
+        if window['first'] is None:
+            window['first'] = ts
+        window['last'] = max(window['last'] or ts, ts)
+        if not success:
+            window['errors'] += 1
+        window['histogram'].record(latency)
+    
+    def merge(self, other):
+        while self.width < other.width:
+            self._coarsen()
+        factor = round(self.width / other.width)
+        for key, window in other.windows.items():
+            self._add(key // factor, window)
+        while len(self.windows) > self.max_windows:
+            self._coarsen()
+        return self
+    
+    def _spans(self):
+        """Seconds each window covered: its full width, except the run's first and last window"""
+        keys = sorted(self.windows)
+        spans = {key: self.width for key in keys}
+        for key in {keys[0], keys[-1]} if keys else ():
+            window = self.windows[key]
+            spans[key] = min(self.width, max(window['last'] - window['first'], 1.0))
+        return spans
+    
+    def rows(self, max_rows=None):
+        """Per-window summaries in time order, folded down to at most max_rows"""
+        windows = self
+        if max_rows:
+            windows = TimeWindows(self.width, max_rows).merge(self)
+        rows = []
+        spans = windows._spans()
+        for key, window in sorted(windows.windows.items()):
+            histogram = window['histogram']
+            rows.append({
+                'start': key * windows.width,
+                'width': windows.width,
+                'rps': window['requests'] / spans[key],
+                'requests': window['requests'],
+                'errors': window['errors'],
+                'error_rate': window['errors'] / window['requests'] if window['requests'] else 0.0,
+                'p50': histogram.percentile(50),
+                'p99': histogram.percentile(99),
+            })
+        return rows
+    
+    def drift(self):
+        """First third vs last third of the windows: (early, late) dicts, or None if too short"""
+        keys = sorted(self.windows)
+        if len(keys) < 3:
+            return None
+        third = len(keys) // 3
+        spans = self._spans()
+        periods = []
+        for period_keys in (keys[:third], keys[-third:]):
+            histogram = LatencyHistogram(sub_bucket_bits=5)
+            requests = errors = 0
+            for key in period_keys:
+                window = self.windows[key]
+                histogram.merge(window['histogram'])
+                requests += window['requests']
+                errors += window['errors']
+            periods.append({
+                'p50': histogram.percentile(50),
+                'p99': histogram.percentile(99),
+                'error_rate': errors / requests if requests else 0.0,
+                'rps': requests / sum(spans[key] for key in period_keys),
+            })
+        return tuple(periods)
+    
+    def to_dict(self):
+        return {
+            'width': self.width,
+            'max_windows': self.max_windows,
+            # Pairs so the int window keys survive JSON
+            'windows': [[key, dict(window, histogram=window['histogram'].to_dict())]
+                        for key, window in self.windows.items()],
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        windows = cls(data['width'], data['max_windows'])
+        windows.windows = {key: dict(window, histogram=LatencyHistogram.from_dict(window['histogram']))
+                           for key, window in data['windows']}
+        return windows
+
+class ResourceIndex:
+    """Per-resource latency, size, status and cache hits across all bots
+
+    Entries are keyed by url_pattern(), so cache-busting query values and ids
+    collapse into one resource. Each keeps a coarse histogram; past max_entries
+    distinct resources the rest are counted under '(other)', so memory stays
+    bounded however many bots and pages run.
+    """
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self.entries = {}
+    
+    def _entry(self, key, kind):
+        entry = self.entries.get(key)
+        if entry is None:
+            if len(self.entries) >= self.max_entries:
+                key = '(other)'
+            entry = self.entries.setdefault(key, {'type': kind, 'count': 0, 'failed': 0, 'cached': 0, 'bytes': 0,
+                                                  'histogram': LatencyHistogram(sub_bucket_bits=5), 'statuses': {}})
+        return entry
+    
+    def record(self, url, kind, transfer_bytes, body_bytes, duration, status):
+        """One fetched resource; duration is None and status 0 for a request that failed outright"""
+        entry = self._entry(url_pattern(url), kind)
+        entry['count'] += 1
+        entry['bytes'] += transfer_bytes
+        # Served from memory/disk cache: a body but nothing over the wire
+        if transfer_bytes == 0 and body_bytes > 0:
+            entry['cached'] += 1
+        if duration is None or status >= 400:
+            entry['failed'] += 1
+        if duration is not None:
+            entry['histogram'].record(duration)
+        if status:
+            entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+    
+    def merge(self, other):
+        for key, other_entry in other.entries.items():
+            entry = self._entry(key, other_entry['type'])
+            for field in ('count', 'failed', 'cached', 'bytes'):
+                entry[field] += other_entry[field]
+            entry['histogram'].merge(other_entry['histogram'])
+            for status, count in other_entry['statuses'].items():
+                entry['statuses'][status] = entry['statuses'].get(status, 0) + count
+        return self
+    
+    def to_dict(self):
+        return {
+            'max_entries': self.max_entries,
+            # Status pairs so int codes survive JSON
+            'entries': {key: dict(entry, histogram=entry['histogram'].to_dict(), statuses=list(entry['statuses'].items()))
+                        for key, entry in self.entries.items()},
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(data['max_entries'])
+        index.entries = {key: dict(entry, histogram=LatencyHistogram.from_dict(entry['histogram']),
+                                   statuses=dict((status, count) for status, count in entry['statuses']))
+                         for key, entry in data['entries'].items()}
+        return index
+
+class RunStats:
+    """Running aggregate of bot results: latency histogram, success and status counts"""
+    MAX_ERROR_SAMPLES = 5
+    MAX_URLS = 50000
+    MAX_PATTERNS = 2000  # A histogram each, so far fewer than URLs
+    
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.setup_histogram = LatencyHistogram()
+        self.lag_histogram = LatencyHistogram()
+        self.windows = TimeWindows()
+        self.phase_histograms = {}
+        self.vitals_histograms = {}
+        self.lcp_by_ttfb = {}
+        self.step_histograms = {}
+        self.step_errors = {}
+        self.error_counts = {}
+        self.error_histograms = {}
+        self.error_samples = {}
+        self.url_stats = {}
+        self.pattern_histograms = {}
+        self.pattern_errors = {}
+        self.warmup = None
+        self.warmup_time = 0.0
+        self.pool = {}
+        self.client = {}
+        self.crashes = {}
+        self.browsers = {}
+        self.cohorts = {}
+        self.resource_index = ResourceIndex()
+        self.resources = 0
+        self.failed_resources = 0
+        self.total = 0
+        self.successful = 0
+        self.status_codes = {}
+    
+    def record(self, result):
+        latency = result_latency(result)
+        self.histogram.record(latency)
+        self.windows.record(time.time(), latency, result['success'])
+        if 'schedule_lag' in result:
+            self.lag_histogram.record(result['schedule_lag'])
+        for phase, seconds in result.get('timing', {}).items():
+            self.phase_histograms.setdefault(phase, LatencyHistogram()).record(seconds)
+        vitals = result.get('vitals')
+        if vitals:
+            # Unitless values (CLS, counts, MB) share the histogram, which only needs numbers
+            for name, value in vitals.items():
+                self.vitals_histograms.setdefault(name, LatencyHistogram()).record(value)
+            if 'lcp' in vitals and 'ttfb' in result.get('timing', {}):
+                band = next(label for limit, label in TTFB_BANDS if result['timing']['ttfb'] < limit)
+                self.lcp_by_ttfb.setdefault(band, LatencyHistogram()).record(vitals['lcp'])
+        for step in result.get('steps', ()):
+            self.step_histograms.setdefault(step['name'], LatencyHistogram()).record(step['elapsed'])
+            if not step['success']:
+                errors = self.step_errors.setdefault(step['name'], {})
+                category = error_type(step)
+                errors[category] = errors.get(category, 0) + 1
+        if 'target' in result:
+            self.record_target(result['target'], latency, result['success'])
+        if 'setup_time' in result:
+            self.setup_histogram.record(result['setup_time'])
+        self.resources += result.get('resources', 0)
+        self.failed_resources += result.get('failed_resources', 0)
+        for resource in result.get('resource_timings', ()):
+            self.resource_index.record(*resource)
+        if 'browser' in result:
+            browser = self.browser_stats(result['browser'])
+            browser['histogram'].record(result['elapsed'])
+            if not result['success']:
+                browser['errors'] += 1
+        if 'cohort' in result:
+            cohort = self.cohort_stats(result['cohort'])
+            cohort['histogram'].record(result['elapsed'])
+            if not result['success']:
+                cohort['errors'] += 1
+            timing = result.get('timing', {})
+            if 'ttfb' in timing:
+                # Time the document's connection was busy on the server: connect to last byte
+                cohort['hold_histogram'].record(sum(timing.get(phase, 0.0) for phase in ('connect', 'tls', 'ttfb', 'download')))
+        self.total += 1
+        if result['success']:
+            self.successful += 1
+        else:
+            category = error_type(result)
+            self.add_error(category, 1, latency, error_sample(result))
+        status = result['status']
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+    
+    def to_dict(self):
+        return {
+            'histogram': self.histogram.to_dict(),
+            'setup_histogram': self.setup_histogram.to_dict(),
+            'lag_histogram': self.lag_histogram.to_dict(),
+            'windows': self.windows.to_dict(),
+            'phase_histograms': {phase: h.to_dict() for phase, h in self.phase_histograms.items()},
+            'vitals_histograms': {name: h.to_dict() for name, h in self.vitals_histograms.items()},
+            'lcp_by_ttfb': {band: h.to_dict() for band, h in self.lcp_by_ttfb.items()},
+            'step_histograms': {name: h.to_dict() for name, h in self.step_histograms.items()},
+            'step_errors': self.step_errors,
+            'error_counts': self.error_counts,
+            'error_histograms': {category: h.to_dict() for category, h in self.error_histograms.items()},
+            'error_samples': self.error_samples,
+            'url_stats': self.url_stats,
+            'pattern_histograms': {pattern: h.to_dict() for pattern, h in self.pattern_histograms.items()},
+            'pattern_errors': self.pattern_errors,
+            'warmup': self.warmup.to_dict() if self.warmup else None,
+            'warmup_time': self.warmup_time,
+            'pool': self.pool,
+            'client': self.client,
+            'crashes': self.crashes,
+            'browsers': [[index, dict(browser, histogram=browser['histogram'].to_dict())]
+                         for index, browser in self.browsers.items()],
+            'cohorts': {name: dict(cohort, histogram=cohort['histogram'].to_dict(),
+                                   hold_histogram=cohort['hold_histogram'].to_dict())
+                        for name, cohort in self.cohorts.items()},
+            'resource_index': self.resource_index.to_dict(),
+            'resources': self.resources,
+            'failed_resources': self.failed_resources,
+            'total': self.total,
+            'successful': self.successful,
+            # Pairs rather than a mapping so int status codes survive JSON
+            'status_codes': list(self.status_codes.items()),
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.histogram = LatencyHistogram.from_dict(data['histogram'])
+        stats.setup_histogram = LatencyHistogram.from_dict(data['setup_histogram'])
+        stats.lag_histogram = LatencyHistogram.from_dict(data['lag_histogram'])
+        if 'windows' in data:
+            stats.windows = TimeWindows.from_dict(data['windows'])
+        stats.phase_histograms = {phase: LatencyHistogram.from_dict(h) for phase, h in data['phase_histograms'].items()}
+        stats.vitals_histograms = {name: LatencyHistogram.from_dict(h) for name, h in data.get('vitals_histograms', {}).items()}
+        stats.lcp_by_ttfb = {band: LatencyHistogram.from_dict(h) for band, h in data.get('lcp_by_ttfb', {}).items()}
+        stats.step_histograms = {name: LatencyHistogram.from_dict(h) for name, h in data.get('step_histograms', {}).items()}
+        stats.step_errors = data.get('step_errors', {})
+        stats.error_counts = data.get('error_counts', {})
+        stats.error_histograms = {category: LatencyHistogram.from_dict(h)
+                                  for category, h in data.get('error_histograms', {}).items()}
+        stats.error_samples = data.get('error_samples', {})
+        stats.url_stats = data.get('url_stats', {})
+        stats.pattern_histograms = {pattern: LatencyHistogram.from_dict(h)
+                                    for pattern, h in data.get('pattern_histograms', {}).items()}
+        stats.pattern_errors = data.get('pattern_errors', {})
+        stats.warmup = cls.from_dict(data['warmup']) if data.get('warmup') else None
+        stats.warmup_time = data.get('warmup_time', 0.0)
+        stats.pool = data['pool']
+        stats.client = data.get('client', {})
+        stats.crashes = data.get('crashes', {})
+        stats.browsers = {index: dict(browser, histogram=LatencyHistogram.from_dict(browser['histogram']))
+                          for index, browser in data.get('browsers', [])}
+        stats.cohorts = {name: dict(cohort, histogram=LatencyHistogram.from_dict(cohort['histogram']),
+                                    hold_histogram=LatencyHistogram.from_dict(cohort['hold_histogram']))
+                         for name, cohort in data.get('cohorts', {}).items()}
+        if 'resource_index' in data:
+            stats.resource_index = ResourceIndex.from_dict(data['resource_index'])
+        stats.resources = data.get('resources', 0)
+        stats.failed_resources = data.get('failed_resources', 0)
+        stats.total = data['total']
+        stats.successful = data['successful']
+        stats.status_codes = dict((status, count) for status, count in data['status_codes'])
+        return stats
+    
+    def warmup_stats(self):
+        """Separate RunStats for the warm-up samples, created on first use"""
+        if self.warmup is None:
+            self.warmup = RunStats()
+        return self.warmup
+    
+    def url_entry(self, url):
+        """[count, errors, total latency, max latency] of a URL; past MAX_URLS new URLs share '(other)'"""
+        entry = self.url_stats.get(url)
+        if entry is None:
+            if len(self.url_stats) >= self.MAX_URLS:
+                url = '(other)'
+            entry = self.url_stats.setdefault(url, [0, 0, 0.0, 0.0])
+        return entry
+    
+    def pattern_key(self, pattern):
+        """Key of a URL pattern's histogram; past MAX_PATTERNS new patterns share '(other)'"""
+        if pattern not in self.pattern_histograms and len(self.pattern_histograms) >= self.MAX_PATTERNS:
+            return '(other)'
+        return pattern
+    
+    def record_target(self, url, latency, success):
+        entry = self.url_entry(url)
+        entry[0] += 1
+        entry[2] += latency
+        entry[3] = max(entry[3], latency)
+        pattern = self.pattern_key(url_pattern(url))
+        self.pattern_histograms.setdefault(pattern, LatencyHistogram()).record(latency)
+        if not success:
+            entry[1] += 1
+            self.pattern_errors[pattern] = self.pattern_errors.get(pattern, 0) + 1
+    
+    def add_error(self, category, count, latency=None, sample=None):
+        """Count failures of a category, with their latency to failure and a few raw messages"""
+        self.error_counts[category] = self.error_counts.get(category, 0) + count
+        if latency is not None:
+            self.error_histograms.setdefault(category, LatencyHistogram()).record(latency)
+        samples = self.error_samples.setdefault(category, [])
+        if sample and len(samples) < self.MAX_ERROR_SAMPLES and sample not in samples:
+            samples.append(sample)
+    
+    def browser_stats(self, index):
+        if index not in self.browsers:
+            self.browsers[index] = {'histogram': LatencyHistogram(), 'errors': 0, 'peak_active': 0}
+        return self.browsers[index]
+    
+    def cohort_stats(self, name):
+        if name not in self.cohorts:
+            self.cohorts[name] = {'histogram': LatencyHistogram(), 'hold_histogram': LatencyHistogram(), 'errors': 0}
+        return self.cohorts[name]
+    
+    def add_browser_peaks(self, peaks):
+        for index, peak in enumerate(peaks):
+            browser = self.browser_stats(index)
+            browser['peak_active'] = max(browser['peak_active'], peak)
+    
+    def add_client_stats(self, client_stats):
+        """Fold in ResourceGovernor stats: times and counts add up, peaks take the max"""
+        client = self.client
+        for key in ('throttled_time', 'throttle_count'):
+            client[key] = client.get(key, 0) + client_stats.get(key, 0)
+        for key in ('peak_rss_mb', 'peak_cpu_percent'):
+            client[key] = max(client.get(key, 0), client_stats.get(key, 0))
+        client['events'] = (client.get('events', []) + client_stats.get('events', []))[:ResourceGovernor.MAX_EVENTS]
+    
+    def add_crash_stats(self, crash_stats):
+        """Fold in BrowserSet.crash_stats: counts and times add up, the first events are kept"""
+        crashes = self.crashes
+        for key in ('crashes', 'restarts', 'downtime', 'requeued', 'lost_time', 'abandoned'):
+            crashes[key] = crashes.get(key, 0) + crash_stats.get(key, 0)
+        crashes['events'] = (crashes.get('events', []) + list(crash_stats.get('events', [])))[:BrowserSet.MAX_EVENTS]
+    
+    def add_pool_stats(self, pool_stats):
+        for key, value in pool_stats.items():
+            self.pool[key] = self.pool.get(key, 0) + value
+    
+    def merge(self, other):
+        self.histogram.merge(other.histogram)
+        self.setup_histogram.merge(other.setup_histogram)
+        self.lag_histogram.merge(other.lag_histogram)
+        self.windows.merge(other.windows)
+        for phase, histogram in other.phase_histograms.items():
+            self.phase_histograms.setdefault(phase, LatencyHistogram()).merge(histogram)
+        for name, histogram in other.vitals_histograms.items():
+            self.vitals_histograms.setdefault(name, LatencyHistogram()).merge(histogram)
+        for band, histogram in other.lcp_by_ttfb.items():
+            self.lcp_by_ttfb.setdefault(band, LatencyHistogram()).merge(histogram)
+        for name, histogram in other.step_histograms.items():
+            self.step_histograms.setdefault(name, LatencyHistogram()).merge(histogram)
+        for name, errors in other.step_errors.items():
+            merged = self.step_errors.setdefault(name, {})
+            for category, count in errors.items():
+                merged[category] = merged.get(category, 0) + count
+        for category, count in other.error_counts.items():
+            self.add_error(category, count)
+        for category, histogram in other.error_histograms.items():
+            self.error_histograms.setdefault(category, LatencyHistogram()).merge(histogram)
+        for category, samples in other.error_samples.items():
+            for sample in samples:
+                self.add_error(category, 0, sample=sample)
+        for url, (count, errors, total, max_latency) in other.url_stats.items():
+            entry = self.url_entry(url)
+            entry[0] += count
+            entry[1] += errors
+            entry[2] += total
+            entry[3] = max(entry[3], max_latency)
+        for pattern, histogram in other.pattern_histograms.items():
+            key = self.pattern_key(pattern)
+            self.pattern_histograms.setdefault(key, LatencyHistogram()).merge(histogram)
+            if pattern in other.pattern_errors:
+                self.pattern_errors[key] = self.pattern_errors.get(key, 0) + other.pattern_errors[pattern]
+        if other.warmup:
+            self.warmup_stats().merge(other.warmup)
+        # Workers warm up side by side, so the longest one is the run's warm-up
+        self.warmup_time = max(self.warmup_time, other.warmup_time)
+        self.add_pool_stats(other.pool)
+        if other.client:
+            self.add_client_stats(other.client)
+        if other.crashes:
+            self.add_crash_stats(other.crashes)
+        # Browser slots with the same index in different workers are folded together
+        for index, browser in other.browsers.items():
+            merged = self.browser_stats(index)
+            merged['histogram'].merge(browser['histogram'])
+            merged['errors'] += browser['errors']
+            merged['peak_active'] = max(merged['peak_active'], browser['peak_active'])
+        for name, cohort in other.cohorts.items():
+            merged = self.cohort_stats(name)
+            merged['histogram'].merge(cohort['histogram'])
+            merged['hold_histogram'].merge(cohort['hold_histogram'])
+            merged['errors'] += cohort['errors']
+        self.resource_index.merge(other.resource_index)
+        self.resources += other.resources
+        self.failed_resources += other.failed_resources
+        self.total += other.total
+        self.successful += other.successful
+        for status, count in other.status_codes.items():
+            self.status_codes[status] = self.status_codes.get(status, 0) + count
+        return self
+
+class MetricsReporter:
+    """Live per-window throughput, error rate and latency for a running test
+
+    Bots only bump window counters in record(); a background task swaps the window
+    out every interval, prints a progress line and optionally appends it as JSONL
+    to jsonl_path. With port set, an OpenMetrics/Prometheus text endpoint is served
+    on 127.0.0.1 for the duration of the run.
+    """
+    def __init__(self, stats, progress_tracker, interval=1.0, jsonl_path=None, port=None):
+        self.stats = stats
+        self.progress_tracker = progress_tracker
+        self.interval = interval
+        self.jsonl_path = jsonl_path
+        self.port = port
+        self.file = None
+        self.server = None
+        self.task = None
+        self.last_window = None
+        self._new_window(time.time())
+    
+    def _new_window(self, now):
+        self.window_start = now
+        self.window_requests = 0
+        self.window_errors = 0
+        self.window_histogram = LatencyHistogram()
+    
+    def record(self, result):
+        self.window_requests += 1
+        if not result['success']:
+            self.window_errors += 1
+        self.window_histogram.record(result_latency(result))
+    
+    async def start(self):
+        self.started = time.time()
+        self._new_window(self.started)
+        if self.jsonl_path:
+            self.file = open(self.jsonl_path, 'a')
+        if self.port:
+            self.server = await asyncio.start_server(self._serve_metrics, '127.0.0.1', self.port)
+            print(f"{self.progress_tracker.prefix}📡 Metrics at http://127.0.0.1:{self.port}/metrics")
+        self.task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.flush()
+    
+    def flush(self):
+        """Close the current window: print it, write it and start a new one"""
+        now = time.time()
+        duration = max(now - self.window_start, 1e-9)
+        histogram = self.window_histogram
+        window = {
+            'ts': round(now, 3),
+            'elapsed': round(now - self.started, 3),
+            'requests': self.window_requests,
+            'errors': self.window_errors,
+            'rps': round(self.window_requests / duration, 2),
+            'error_rate': round(self.window_errors / self.window_requests, 4) if self.window_requests else 0.0,
+            'p50': round(histogram.percentile(50), 4),
+            'p90': round(histogram.percentile(90), 4),
+            'p99': round(histogram.percentile(99), 4),
+            'max': round(histogram.max or 0.0, 4),
+            'completed': self.progress_tracker.completed,
+            'total': self.progress_tracker.total,
+        }
+        self.last_window = window
+        self._new_window(now)
+        
+        if self.file:
+            self.file.write(json.dumps(window) + '\n')
+            self.file.flush()
+        
+        tracker = self.progress_tracker
+        if tracker.total is None:
+            # Duration-bound run, progress is time rather than a bot count
+            progress = f"{tracker.completed} done at {window['elapsed']:.0f}s"
+        else:
+            progress = f"{tracker.completed}/{tracker.total} ({tracker.completed / tracker.total * 100 if tracker.total else 0.0:.1f}%)"
+        print(f"{tracker.prefix}Progress: {progress} | "
+              f"{window['rps']:.1f} req/s | errors {window['error_rate']*100:.1f}% | "
+              f"p50 {window['p50']:.3f}s p99 {window['p99']:.3f}s")
+        return window
+    
+    def render_metrics(self):
+        """Current counters and latest window in Prometheus text exposition format"""
+        stats = self.stats
+        lines = [
+            '# TYPE bots_requests_total counter',
+            f'bots_requests_total {stats.total}',
+            '# TYPE bots_errors_total counter',
+            f'bots_errors_total {stats.total - stats.successful}',
+            '# TYPE bots_latency_seconds summary',
+        ]
+        for quantile in (0.5, 0.9, 0.99, 0.999):
+            lines.append(f'bots_latency_seconds{{quantile="{quantile}"}} {stats.histogram.percentile(quantile * 100):.6f}')
+        lines.append(f'bots_latency_seconds_sum {stats.histogram.total:.6f}')
+        lines.append(f'bots_latency_seconds_count {stats.histogram.count}')
+        if self.last_window:
+            for key in ('rps', 'error_rate', 'p50', 'p90', 'p99'):
+                lines.append(f'# TYPE bots_window_{key} gauge')
+                lines.append(f'bots_window_{key} {self.last_window[key]}')
+        return '\n'.join(lines) + '\n'
+    
+    async def _serve_metrics(self, reader, writer):
+        try:
+            await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            body = self.render_metrics().encode()
+            writer.write(b'HTTP/1.1 200 OK\r\n'
+                         b'Content-Type: text/plain; version=0.0.4\r\n'
+                         b'Content-Length: ' + str(len(body)).encode() + b'\r\n'
+                         b'Connection: close\r\n\r\n' + body)
+            await writer.drain()
+        finally:
+            writer.close()
+    
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.window_requests:
+            self.flush()
+        if self.file:
+            self.file.close()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+def classify_error(error):
+    """Taxonomy key (see ERROR_TYPES) for an exception, or for an error message"""
+    if isinstance(error, socket.gaierror):
+        return 'dns'
+    if isinstance(error, ssl.SSLError):
+        return 'tls'
+    if isinstance(error, ConnectionRefusedError):
+        return 'connect_refused'
+    if isinstance(error, (ConnectionError, asyncio.IncompleteReadError)):
+        return 'connect_reset'
+    if isinstance(error, TimeoutError):
+        return 'timeout'
+    if isinstance(error, OSError):
+        return 'connect_failed'
+    message = str(error)
+    for category, patterns in ERROR_PATTERNS:
+        if any(pattern in message for pattern in patterns):
+            if category == 'timeout' and 'navigating to' in message:
+                # Playwright puts the goto call log under the timeout message
+                return 'navigation_timeout'
+            return category
+    return 'other'
+
+def error_type(result):
+    """Taxonomy key of a failed result: as classified at capture, else from its status"""
+    if 'error_type' in result:
+        return result['error_type']
+    status = result['status']
+    if isinstance(status, int):
+        return 'http_5xx' if status >= 500 else 'http_4xx'
+    if status == 'No Response':
+        return 'no_response'
+    return classify_error(result.get('error', ''))
+
+def error_sample(result):
+    return result.get('error', f"Status {result['status']}").split('\n')[0][:200]
+
+class ResultStore:
+    """Compact columnar store of per-bot results, flushed to disk incrementally
 
-async def send_request(browser, url, bot_id, progress_tracker, verbose=False):
-    """Send a single HTTP request using Playwright and return the result"""
+    Rows live in typed arrays (bot id, completion timestamp, latency, status code,
+    error id, success, flags: 1 = warm-up); error types are interned into a string table. With a
+    path, every flush_every rows are appended to the file as a binary chunk so
+    memory stays bounded. The file is a magic header followed by chunks of
+    kind byte + little-endian u32 length + payload: 'M' JSON metadata, 'S' JSON
+    list of new error strings, 'D' u32 row count followed by each column's bytes.
+    An existing file is appended to (a run writes its metadata and rows in several
+    passes) unless overwrite is set, which a new run uses to start the file afresh.
+    """
+    MAGIC = b'BOTSRUN2'
+    COLUMNS = (('bot_id', 'q'), ('ts', 'd'), ('latency', 'd'), ('status', 'h'), ('error_id', 'I'), ('success', 'b'),
+               ('flags', 'B'))
+    # Older formats: magic -> the columns its data chunks hold (the rest load as zeros)
+    LEGACY_FORMATS = {b'BOTSRUN1': COLUMNS[:6]}
+    WARMUP = 1
+    SPECIAL_STATUSES = {'Error': 0, 'No Response': -1}
+    
+    def __init__(self, path=None, flush_every=10000, overwrite=False):
+        self.path = path
+        self.flush_every = flush_every
+        self.columns = {name: array(code) for name, code in self.COLUMNS}
+        self.errors = ['']
+        self.error_ids = {'': 0}
+        self.pending_errors = []
+        self.meta = {}
+        self.file = None
+        if path:
+            self.file = open(path, 'w+b' if overwrite else 'a+b')
+            if self.file.tell() == 0:
+                self.file.write(self.MAGIC)
+            else:
+                self.file.seek(0)
+                if self.file.read(len(self.MAGIC)) != self.MAGIC:
+                    raise ValueError(f"{path} holds results in another format, cannot append to it")
+                self.file.seek(0, os.SEEK_END)
+    
+    def __len__(self):
+        return len(self.columns['bot_id'])
+    
+    def _error_id(self, message):
+        error_id = self.error_ids.get(message)
+        if error_id is None:
+            error_id = self.error_ids[message] = len(self.errors)
+            self.errors.append(message)
+            self.pending_errors.append(message)
+        return error_id
+    
+    def _write_chunk(self, kind, payload):
+        self.file.write(kind + struct.pack('<I', len(payload)) + payload)
+    
+    def write_meta(self, **meta):
+        self.meta.update(meta)
+        if self.file:
+            self._write_chunk(b'M', json.dumps(meta).encode())
+            self.file.flush()
+    
+    def record(self, result):
+        status = result['status']
+        columns = self.columns
+        columns['bot_id'].append(result['bot_id'])
+        columns['ts'].append(time.time())
+        columns['latency'].append(result_latency(result))
+        columns['status'].append(status if isinstance(status, int) else self.SPECIAL_STATUSES.get(status, 0))
+        columns['error_id'].append(0 if result['success'] else self._error_id(error_type(result)))
+        columns['success'].append(1 if result['success'] else 0)
+        columns['flags'].append(self.WARMUP if result.get('warmup') else 0)
+        if self.file and len(self) >= self.flush_every:
+            self.flush()
+    
+    def flush(self):
+        if not self.file:
+            return
+        if self.pending_errors:
+            self._write_chunk(b'S', json.dumps(self.pending_errors).encode())
+            self.pending_errors = []
+        if len(self):
+            payload = [struct.pack('<I', len(self))]
+            for name, code in self.COLUMNS:
+                column = self.columns[name]
+                if sys.byteorder == 'big':
+                    column.byteswap()
+                payload.append(column.tobytes())
+                self.columns[name] = array(code)
+            self._write_chunk(b'D', b''.join(payload))
+        self.file.flush()
+    
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
+    
+    @classmethod
+    def load(cls, path):
+        """Read a stored run (and any worker part files it references) into memory"""
+        store = cls()
+        store._load_file(path, keep_meta=True)
+        for part in store.meta.get('parts', []):
+            store._load_file(os.path.join(os.path.dirname(path), part), keep_meta=False)
+        return store
+    
+    def _load_file(self, path, keep_meta):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic = data[:len(self.MAGIC)]
+        if magic == self.MAGIC:
+            file_columns = self.COLUMNS
+        elif magic in self.LEGACY_FORMATS:
+            file_columns = self.LEGACY_FORMATS[magic]
+        else:
+            raise ValueError(f"{path} is not a bots.py results file")
+        missing = [(name, code) for name, code in self.COLUMNS if (name, code) not in file_columns]
+        
+        # Error ids are per file, remap them onto this store's table
+        local_errors = [0]
+        pos = len(self.MAGIC)
+        while pos + 5 <= len(data):
+            kind = data[pos:pos + 1]
+            length, = struct.unpack_from('<I', data, pos + 1)
+            payload = data[pos + 5:pos + 5 + length]
+            pos += 5 + length
+            if len(payload) < length:
+                break  # Truncated tail from an interrupted run
+            
+            if kind == b'M' and keep_meta:
+                self.meta.update(json.loads(payload))
+            elif kind == b'S':
+                local_errors.extend(self._error_id(message) for message in json.loads(payload))
+            elif kind == b'D':
+                rows, = struct.unpack_from('<I', payload)
+                offset = 4
+                for name, code in file_columns:
+                    column = array(code)
+                    size = rows * column.itemsize
+                    column.frombytes(payload[offset:offset + size])
+                    offset += size
+                    if sys.byteorder == 'big':
+                        column.byteswap()
+                    if name == 'error_id':
+                        column = array(code, (local_errors[error_id] for error_id in column))
+                    self.columns[name].extend(column)
+                for name, code in missing:
+                    self.columns[name].extend(array(code, bytes(rows * array(code).itemsize)))
+        self.pending_errors = []
+    
+    def statuses(self):
+        special = {code: name for name, code in self.SPECIAL_STATUSES.items()}
+        return [special.get(status, status) for status in self.columns['status']]
+    
+    def build_stats(self):
+        """RunStats for the stored run: core numbers rebuilt from the rows, extras from metadata
+
+        Rows flagged as warm-up go to stats.warmup, as they did during the run.
+        """
+        stats = RunStats.from_dict(self.meta['stats']) if 'stats' in self.meta else RunStats()
+        warmup = stats.warmup_stats() if any(flags & self.WARMUP for flags in self.columns['flags']) else None
+        for rebuilt in filter(None, (stats, warmup)):
+            rebuilt.histogram = LatencyHistogram()
+            rebuilt.windows = TimeWindows()
+            rebuilt.error_counts = {}
+            rebuilt.error_histograms = {}
+            rebuilt.total = 0
+            rebuilt.successful = 0
+            rebuilt.status_codes = {}
+        columns = self.columns
+        for ts, latency, success, error_id, status, flags in zip(columns['ts'], columns['latency'], columns['success'],
+                                                                 columns['error_id'], self.statuses(), columns['flags']):
+            target = warmup if flags & self.WARMUP else stats
+            target.histogram.record(latency)
+            target.windows.record(ts, latency, success)
+            target.total += 1
+            if success:
+                target.successful += 1
+            else:
+                target.add_error(self.errors[error_id], 1, latency)
+            target.status_codes[status] = target.status_codes.get(status, 0) + 1
+        return stats
+    
+    def span(self):
+        """Wall time covered by the stored rows (first send to last completion)"""
+        if not len(self):
+            return 0.0
+        first_send = min(ts - latency for ts, latency in zip(self.columns['ts'], self.columns['latency']))
+        return max(self.columns['ts']) - first_send
+
+class ResourceGovernor:
+    """Throttle new bots while the load generator itself is out of memory or CPU
+
+    Samples RSS and CPU of this process and all its children (Playwright driver,
+    Chromium) every interval and holds new contexts back while either is above its
+    limit, resuming below 90% of it. max_cpu_percent is of the whole machine.
+    Needs: pip install psutil
+    """
+    MAX_EVENTS = 100
+    
+    def __init__(self, max_rss_mb=None, max_cpu_percent=None, interval=0.5):
+        try:
+            import psutil
+        except ImportError:
+            raise RuntimeError("The resource governor needs psutil: pip install psutil")
+        self.psutil = psutil
+        self.root = psutil.Process()
+        self.processes = {}
+        self.cpu_count = psutil.cpu_count() or 1
+        self.max_rss_mb = max_rss_mb
+        self.max_cpu_percent = max_cpu_percent
+        self.interval = interval
+        self.allowed = asyncio.Event()
+        self.allowed.set()
+        self.task = None
+        self.throttled_since = None
+        self.reason = None
+        self.stats = {'peak_rss_mb': 0.0, 'peak_cpu_percent': 0.0, 'throttled_time': 0.0,
+                      'throttle_count': 0, 'events': []}
+    
+    def sample(self):
+        """Current (rss_mb, cpu_percent_of_machine) of the whole process tree"""
+        current = {self.root.pid: self.root}
+        try:
+            for child in self.root.children(recursive=True):
+                current[child.pid] = self.processes.get(child.pid, child)
+        except self.psutil.Error:
+            pass
+        self.processes = current
+        
+        rss = 0
+        cpu = 0.0
+        for process in current.values():
+            try:
+                rss += process.memory_info().rss
+                cpu += process.cpu_percent(None)
+            except self.psutil.Error:
+                pass
+        return rss / (1024 * 1024), cpu / self.cpu_count
+    
+    def _over_limit(self, rss_mb, cpu, factor=1.0):
+        if self.max_rss_mb and rss_mb > self.max_rss_mb * factor:
+            return f"RSS {rss_mb:.0f}MB"
+        if self.max_cpu_percent and cpu > self.max_cpu_percent * factor:
+            return f"CPU {cpu:.0f}%"
+        return None
+    
+    async def _run(self):
+        while True:
+            rss_mb, cpu = self.sample()
+            self.stats['peak_rss_mb'] = max(self.stats['peak_rss_mb'], rss_mb)
+            self.stats['peak_cpu_percent'] = max(self.stats['peak_cpu_percent'], cpu)
+            
+            if self.allowed.is_set():
+                reason = self._over_limit(rss_mb, cpu)
+                if reason:
+                    self.allowed.clear()
+                    self.throttled_since = time.time()
+                    self.reason = reason
+                    self.stats['throttle_count'] += 1
+            elif not self._over_limit(rss_mb, cpu, factor=0.9):
+                self._end_throttle()
+            await asyncio.sleep(self.interval)
+    
+    def _end_throttle(self):
+        duration = time.time() - self.throttled_since
+        self.stats['throttled_time'] += duration
+        if len(self.stats['events']) < self.MAX_EVENTS:
+            self.stats['events'].append([round(self.throttled_since - self.started, 2), round(duration, 2), self.reason])
+        self.allowed.set()
+    
+    async def wait(self):
+        """Block a bot from starting while the client is over its limits"""
+        await self.allowed.wait()
+    
+    async def start(self):
+        self.started = time.time()
+        self.sample()  # Prime cpu_percent counters
+        self.task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if not self.allowed.is_set():
+            self._end_throttle()
+
+async def new_bot_context(browser):
+    """Create a fresh isolated browser context with the bot viewport, user agent and vitals observers"""
+    context = await browser.new_context(
+        viewport={'width': 1920, 'height': 1080},
+        user_agent=USER_AGENT
+    )
+    await context.add_init_script(PAGE_INIT_JS)
+    return context
+
+class ContextPool:
+    """Pool of pre-created browser contexts/pages recycled between bots
+
+    reset lists what is wiped when a page goes back to the pool: 'cookies',
+    'storage' (local/session storage) and 'cache' (Chromium HTTP cache via CDP).
+    """
+    def __init__(self, browser, size, reset=('cookies', 'storage')):
+        self.browser = browser
+        self.size = size
+        self.reset = set(reset)
+        self.available = asyncio.Queue()
+        self.closed = False
+        self.stats = {'created': 0, 'recycled': 0, 'replaced': 0, 'warmup_time': 0.0, 'reset_time': 0.0}
+    
+    async def _create(self):
+        context = await new_bot_context(self.browser)
+        page = await context.new_page()
+        self.stats['created'] += 1
+        return context, page
+    
+    async def start(self):
+        """Create every context/page up front so bots never pay for it"""
+        start_time = time.time()
+        for context, page in await asyncio.gather(*(self._create() for _ in range(self.size))):
+            self.available.put_nowait((context, page))
+        self.stats['warmup_time'] = time.time() - start_time
+    
+    async def acquire(self):
+        item = await self.available.get()
+        if item is None:
+            # Closed pool: pass the marker on so every waiting bot fails over
+            self.available.put_nowait(None)
+            raise RuntimeError("Context pool closed (browser relaunched or left down)")
+        return item
+    
+    async def release(self, context, page):
+        """Reset the context state and hand it back, replacing it if the reset fails"""
+        if self.closed:
+            try:
+                await context.close()
+            except Exception:
+                pass
+            return
+        start_time = time.time()
+        try:
+            if 'cache' in self.reset:
+                cdp = await context.new_cdp_session(page)
+                await cdp.send('Network.clearBrowserCache')
+                await cdp.detach()
+            if 'storage' in self.reset:
+                await page.evaluate("() => { try { localStorage.clear(); sessionStorage.clear(); } catch (e) {} }")
+            if 'cookies' in self.reset:
+                await context.clear_cookies()
+            await page.goto('about:blank')
+            self.stats['recycled'] += 1
+        except Exception:
+            # Crashed or wedged page: drop the whole context and build a new one
+            try:
+                await context.close()
+            except Exception:
+                pass
+            try:
+                context, page = await self._create()
+            except Exception:
+                if not self.browser.is_connected():
+                    # The browser itself is gone: fail the waiting bots rather than let them wait
+                    # for slots that never come back (BrowserSet rebuilds the pool on relaunch)
+                    await self.close()
+                return
+            self.stats['replaced'] += 1
+        self.stats['reset_time'] += time.time() - start_time
+        self.available.put_nowait((context, page))
+    
+    async def close(self):
+        self.closed = True
+        while not self.available.empty():
+            item = self.available.get_nowait()
+            if item:
+                try:
+                    await item[0].close()
+                except Exception:
+                    pass
+        self.available.put_nowait(None)
+
+SCENARIO_ACTIONS = ('goto', 'click', 'fill', 'press', 'wait_for', 'wait')
+
+def normalize_scenario(steps):
+    """Validate journey steps and give every step a stable display name
+
+    Each step is a dict with an 'action' of goto (url, relative to the target),
+    click / fill / press / wait_for (selector; fill takes value, press takes key;
+    click accepts wait_until to also wait for the resulting load state) or wait
+    (ms of think time), plus an optional 'name' and 'timeout' in ms.
+    """
+    if not steps or steps[0].get('action') != 'goto':
+        raise ValueError("A scenario must start with a 'goto' step")
+    normalized = []
+    for index, step in enumerate(steps, 1):
+        action = step.get('action')
+        if action not in SCENARIO_ACTIONS:
+            raise ValueError(f"Step {index}: unknown action {action!r} (expected one of {', '.join(SCENARIO_ACTIONS)})")
+        if action in ('click', 'fill', 'press', 'wait_for') and not step.get('selector'):
+            raise ValueError(f"Step {index}: {action} needs a selector")
+        target = step.get('selector') or step.get('url') or step.get('ms', '')
+        normalized.append(dict(step, name=step.get('name') or f"{index}. {action} {target}".strip()))
+    return normalized
+
+def load_scenario(path):
+    """Load journey steps from a YAML (needs: pip install pyyaml) or JSON file
+
+    The file holds a list of steps, or a mapping with a 'steps' list, e.g.:
+        - {name: home, action: goto, url: /}
+        - {name: search, action: fill, selector: '#q', value: laptops}
+        - {name: results, action: press, selector: '#q', key: Enter}
+        - {action: wait_for, selector: .result}
+    """
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('steps', [])
+    return normalize_scenario(data)
+
+async def run_scenario(page, url, scenario, step_results):
+    """Run journey steps on one page, appending a timing entry per step to step_results
+
+    Stops at the first failing step (its entry carries the error) and re-raises.
+    Returns the last navigation response.
+    """
+    response = None
+    for step in scenario:
+        action = step['action']
+        timeout = step.get('timeout', 30000)
+        start_time = time.time()
+        try:
+            if action == 'goto':
+                response = await page.goto(urljoin(url, step.get('url', '')),
+                                           wait_until=step.get('wait_until', 'domcontentloaded'), timeout=timeout)
+            elif action == 'click':
+                await page.click(step['selector'], timeout=timeout)
+                if step.get('wait_until'):
+                    await page.wait_for_load_state(step['wait_until'], timeout=timeout)
+            elif action == 'fill':
+                await page.fill(step['selector'], str(step.get('value', '')), timeout=timeout)
+            elif action == 'press':
+                await page.press(step['selector'], step.get('key', 'Enter'), timeout=timeout)
+            elif action == 'wait_for':
+                await page.wait_for_selector(step['selector'], state=step.get('state', 'visible'), timeout=timeout)
+            elif action == 'wait':
+                await asyncio.sleep(step.get('ms', 1000) / 1000)
+        except Exception as e:
+            step_results.append({'name': step['name'], 'elapsed': time.time() - start_time,
+                                 'success': False, 'error': str(e)[:200], 'error_type': classify_error(e)})
+            raise
+        step_results.append({'name': step['name'], 'elapsed': time.time() - start_time, 'success': True})
+    return response
+
+# Chrome DevTools throttling presets: latency in ms, bandwidth in kbit/s (None = unthrottled)
+NETWORK_PROFILES = {
+    'lan': {'latency_ms': 0, 'download_kbps': None, 'upload_kbps': None, 'cpu_slowdown': 1},
+    'cable': {'latency_ms': 28, 'download_kbps': 5000, 'upload_kbps': 1000, 'cpu_slowdown': 1},
+    '4g': {'latency_ms': 170, 'download_kbps': 9000, 'upload_kbps': 9000, 'cpu_slowdown': 2},
+    'fast-3g': {'latency_ms': 562.5, 'download_kbps': 1440, 'upload_kbps': 675, 'cpu_slowdown': 4},
+    'slow-3g': {'latency_ms': 2000, 'download_kbps': 400, 'upload_kbps': 400, 'cpu_slowdown': 6},
+}
+
+def normalize_cohorts(cohorts):
+    """Validate network cohorts into [{name, weight, latency_ms, download_kbps, upload_kbps, cpu_slowdown}]
+
+    Each cohort is a NETWORK_PROFILES name, or a dict with an optional 'profile' to
+    start from, any of those fields to override it, a 'name' and a 'weight' (share
+    of the bots, default 1).
+    """
+    normalized = []
+    for index, cohort in enumerate(cohorts, 1):
+        if isinstance(cohort, str):
+            cohort = {'profile': cohort}
+        profile = cohort.get('profile', 'lan')
+        if profile not in NETWORK_PROFILES:
+            raise ValueError(f"Cohort {index}: unknown network profile {profile!r} (expected one of {', '.join(NETWORK_PROFILES)})")
+        merged = dict(NETWORK_PROFILES[profile], name=cohort.get('name') or profile, weight=float(cohort.get('weight', 1.0)))
+        merged.update((key, cohort[key]) for key in NETWORK_PROFILES['lan'] if key in cohort)
+        if merged['weight'] <= 0:
+            raise ValueError(f"Cohort {index}: weight must be positive")
+        normalized.append(merged)
+    if len({cohort['name'] for cohort in normalized}) != len(normalized):
+        raise ValueError("Cohort names must be unique")
+    return normalized
+
+async def emulate_network(context, page, cohort):
+    """Throttle a page to a cohort's link and CPU over CDP; returns the session holding it
+
+    The throttling lasts while the session is attached, so detach it (see
+    send_request) before the page is reused by another bot.
+    """
+    cdp = await context.new_cdp_session(page)
+    await cdp.send('Network.enable')
+    await cdp.send('Network.emulateNetworkConditions', {
+        'offline': False,
+        'latency': cohort['latency_ms'],
+        # CDP takes bytes per second, -1 disables the limit
+        'downloadThroughput': cohort['download_kbps'] * 125 if cohort['download_kbps'] else -1,
+        'uploadThroughput': cohort['upload_kbps'] * 125 if cohort['upload_kbps'] else -1,
+    })
+    if cohort['cpu_slowdown'] != 1:
+        await cdp.send('Emulation.setCPUThrottlingRate', {'rate': cohort['cpu_slowdown']})
+    return cdp
+
+async def settle_page(page, timeout):
+    """Wait up to timeout seconds for the load event and then for the network to go idle
+
+    Timings, vitals and the resource list are read after this: at DOMContentLoaded
+    the load phase is not over yet, LCP is often missing and CLS/TBT are cut short,
+    and resources still loading (lazy assets, API calls fired after load) have no
+    timing entry yet. Network idle is 500ms without requests, so a settled page also
+    gets its load handlers and a late LCP candidate in. A page that does not get
+    there in time (polling, long-lived connections) is read as it is.
+    """
+    if not timeout:
+        return
+    deadline = time.time() + timeout
+    try:
+        await page.wait_for_load_state('load', timeout=timeout * 1000)
+        await page.wait_for_load_state('networkidle', timeout=max(1.0, (deadline - time.time()) * 1000))
+    except Exception:
+        pass
+
+async def send_request(browser, url, bot_id, progress_tracker, verbose=False, context_pool=None, scenario=None,
+                       cohort=None, headers=None, settle=0):
+    """Send a single HTTP request using Playwright and return the result
+
+    Context/page setup (or pool checkout) is timed separately as setup_time and is
+    not part of the reported navigation elapsed. With a scenario the bot walks the
+    journey steps instead of a single goto, and the result carries per-step timings.
+    With a cohort (see normalize_cohorts) the page runs on that emulated network
+    and CPU, and the result is tagged with the cohort name.
+    Every subresource the page fetched (and every request that failed) is returned
+    in resource_timings for the ResourceIndex. headers are sent with every request
+    the page makes (third-party ones included, which may trigger CORS preflights).
+    progress_tracker may be None when the caller counts progress itself.
+    elapsed stops at DOMContentLoaded (or the last scenario step). With settle the page
+    is then given up to that many seconds (see settle_page) before its timings, vitals
+    and resources are read, so those cover the full load; the bot keeps its slot meanwhile.
+    """
     context = None
     page = None
+    cdp = None
+    failed_requests = []
+    
+    def on_request_failed(request):
+        failed_requests.append((request.url, request.resource_type, 0, 0, None, 0))
+
+    setup_time = 0.0
+    step_results = []
+    start_time = time.time()
     
     try:
         if verbose and bot_id <= 5:
             print(f"[Bot {bot_id}] Starting...")
         
-        start_time = time.time()
-        
-        # Create a new browser context (isolated session)
-        context = await browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        )
+        if context_pool:
+            # Reuse a warm context/page from the pool
+            context, page = await context_pool.acquire()
+        else:
+            # Create a new browser context (isolated session) and page
+            context = await new_bot_context(browser)
+            page = await context.new_page()
+        page.on('requestfailed', on_request_failed)
+        if headers or context_pool:
+            # Pooled contexts keep the previous bot's headers otherwise
+            await context.set_extra_http_headers(headers or {})
+        if cohort:
+            cdp = await emulate_network(context, page, cohort)
         
-        # Create a new page
-        page = await context.new_page()
+        setup_time = time.time() - start_time
+        start_time = time.time()
         
-        # Navigate to the URL
-        response = await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        if scenario:
+            response = await run_scenario(page, url, scenario, step_results)
+        else:
+            # Navigate to the URL
+            response = await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        elapsed = time.time() - start_time
         
-        # Get page information
-        title = await page.title()
+        await settle_page(page, settle)
+        # Get page information and the timing breakdown in a single evaluation
+        info = await page.evaluate(PAGE_INFO_JS)
+        title = info['title']
         current_url = page.url
         status = response.status if response else 'No Response'
         
-        elapsed = time.time() - start_time
-        
         if verbose and bot_id <= 5:
             print(f"[Bot {bot_id}] ✓ Status {status} ({elapsed:.2f}s) - {title[:40]}")
         
@@ -53,103 +1520,1138 @@ async def send_request(browser, url, bot_id, progress_tracker, verbose=False):
             'bot_id': bot_id,
             'status': status,
             'elapsed': elapsed,
+            'setup_time': setup_time,
             'success': 200 <= status < 400 if isinstance(status, int) else False,
             'title': title[:50],
             'url': current_url
         }
+        if info['timing']:
+            result['timing'] = {phase: value / 1000 for phase, value in info['timing'].items()
+                                if value is not None and value >= 0}
+        if info.get('vitals'):
+            result['vitals'] = {name: value / 1000 if name in VITALS_MS else value
+                                for name, value in info['vitals'].items() if value is not None}
+        result['resource_timings'] = [(name, kind, transfer_bytes, body_bytes, duration / 1000, status)
+                                      for name, kind, transfer_bytes, body_bytes, duration, status in info['resources']]
+        result['resource_timings'].extend(failed_requests)
+        if step_results:
+            result['steps'] = step_results
+        
+        return result
+        
+    except Exception as e:
+        elapsed = time.time() - start_time
+        error_msg = str(e)
+        
+        if verbose and bot_id <= 5:
+            print(f"[Bot {bot_id}] ✗ Error: {error_msg[:60]}")
+        
+        result = {
+            'bot_id': bot_id,
+            'status': 'Error',
+            'elapsed': elapsed,
+            'setup_time': setup_time,
+            'success': False,
+            'error': error_msg[:200],
+            'error_type': classify_error(e)
+        }
+        if step_results:
+            result['steps'] = step_results
+        if failed_requests:
+            result['resource_timings'] = failed_requests
+        
+        return result
+        
+    finally:
+        if page:
+            page.remove_listener('requestfailed', on_request_failed)
+        if cdp:
+            # Lift the throttling before the page is reused or closed
+            try:
+                if cohort['cpu_slowdown'] != 1:
+                    await cdp.send('Emulation.setCPUThrottlingRate', {'rate': 1})
+                await cdp.detach()
+            except Exception:
+                pass
+        # Clean up (or recycle into the pool)
+        if context_pool and page:
+            await context_pool.release(context, page)
+        else:
+            if page:
+                await page.close()
+            if context:
+                await context.close()
+        
+        if progress_tracker:
+            await progress_tracker.increment()
+
+class BrowserSet:
+    """Several browser instances in one process with bots spread across them
+
+    strategy is 'round_robin' or 'least_loaded' (fewest bots currently in flight).
+    Each browser may have its own ContextPool; per-browser peak concurrency is tracked.
+    With launch (a coroutine function returning a new browser) the set supervises its
+    browsers: one found disconnected after a failed bot is relaunched (at most
+    max_restarts times per run) with a fresh pool, and every bot it took down is
+    requeued up to max_retries times. Crashes, relaunch downtime and the time spent
+    in discarded attempts are kept in crash_stats instead of the bots' results.
+    """
+    MAX_EVENTS = 20
+    
+    def __init__(self, browsers, strategy='round_robin', pools=None, launch=None, max_retries=2, max_restarts=10,
+                 settle=0):
+        if strategy not in ('round_robin', 'least_loaded'):
+            raise ValueError(f"Unknown browser strategy: {strategy!r} (expected 'round_robin' or 'least_loaded')")
+        self.browsers = browsers
+        self.pools = pools or [None] * len(browsers)
+        self.strategy = strategy
+        self.active = [0] * len(browsers)
+        self.peak_active = [0] * len(browsers)
+        self.next_index = 0
+        self.launch = launch
+        self.settle = settle
+        self.max_retries = max_retries
+        self.max_restarts = max_restarts
+        self.generations = [0] * len(browsers)
+        self.relaunching = [None] * len(browsers)
+        self.down = set()
+        self.retired_pools = []
+        self.started = time.time()
+        self.crash_stats = {'crashes': 0, 'restarts': 0, 'downtime': 0.0, 'requeued': 0, 'lost_time': 0.0,
+                            'abandoned': 0, 'events': []}
+    
+    def pick(self):
+        # Route around browsers that are down for good (restart budget spent)
+        candidates = range(len(self.browsers))
+        if self.launch:
+            candidates = [index for index in candidates
+                          if self.relaunching[index] or self.browsers[index].is_connected()] or candidates
+        if self.strategy == 'least_loaded':
+            index = min(candidates, key=self.active.__getitem__)
+        else:
+            index = self.next_index
+            while index not in candidates:
+                index = (index + 1) % len(self.browsers)
+            self.next_index = (index + 1) % len(self.browsers)
+        return index
+    
+    async def recover(self, index, generation):
+        """Relaunch browser index once per crash, however many of its bots noticed it"""
+        if self.generations[index] != generation or index in self.down:
+            return
+        task = self.relaunching[index]
+        if task is None:
+            if self.crash_stats['restarts'] >= self.max_restarts:
+                # Still a crash, counted once; pick() routes around the browser from now on
+                self.down.add(index)
+                self.crash_stats['crashes'] += 1
+                if len(self.crash_stats['events']) < self.MAX_EVENTS:
+                    self.crash_stats['events'].append((time.time() - self.started, 0.0,
+                                                       f"browser {index + 1} disconnected, left down (no restarts left)"))
+                if self.pools[index]:
+                    # Its contexts are gone and never come back: fail the bots waiting on it
+                    await self.pools[index].close()
+                return
+            self.crash_stats['restarts'] += 1
+            task = self.relaunching[index] = asyncio.create_task(self._relaunch(index))
+        await asyncio.shield(task)
+    
+    async def _relaunch(self, index):
+        stats = self.crash_stats
+        crashed_at = time.time()
+        stats['crashes'] += 1
+        reason = f"browser {index + 1} disconnected, relaunched"
+        try:
+            pool = self.pools[index]
+            if pool:
+                self.retired_pools.append(pool)
+                await pool.close()
+            try:
+                await self.browsers[index].close()
+            except Exception:
+                pass
+            browser = await self.launch()
+            try:
+                if pool:
+                    new_pool = ContextPool(browser, pool.size, reset=pool.reset)
+                    await new_pool.start()
+                    self.pools[index] = new_pool
+            except Exception:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+                raise
+            self.browsers[index] = browser
+        except Exception as e:
+            reason = f"browser {index + 1} disconnected, relaunch failed: {str(e)[:80]}"
+        finally:
+            self.generations[index] += 1
+            self.relaunching[index] = None
+            stats['downtime'] += time.time() - crashed_at
+            if len(stats['events']) < self.MAX_EVENTS:
+                stats['events'].append((crashed_at - self.started, time.time() - crashed_at, reason))
+    
+    async def send(self, url, bot_id, progress_tracker, verbose=False, scenario=None, cohort=None, headers=None):
+        """Run send_request on the chosen browser and tag the result with its index (and cohort)
+
+        A bot that failed because its browser died is requeued on the relaunched one;
+        only its final attempt is returned and counted as progress.
+        """
+        attempt = 0
+        while True:
+            index = self.pick()
+            if self.relaunching[index]:
+                await asyncio.shield(self.relaunching[index])
+            generation = self.generations[index]
+            browser = self.browsers[index]
+            self.active[index] += 1
+            self.peak_active[index] = max(self.peak_active[index], self.active[index])
+            try:
+                result = await send_request(browser, url, bot_id, None, verbose,
+                                            self.pools[index], scenario, cohort, headers, self.settle)
+            finally:
+                self.active[index] -= 1
+            if result['success'] or not self.launch or browser.is_connected():
+                break
+            # The browser died under this bot: not the target's fault
+            await self.recover(index, generation)
+            result['error_type'] = 'browser_crash'
+            if attempt >= self.max_retries:
+                self.crash_stats['abandoned'] += 1
+                break
+            attempt += 1
+            self.crash_stats['requeued'] += 1
+            self.crash_stats['lost_time'] += result['elapsed'] + result['setup_time']
+        await progress_tracker.increment()
+        result['browser'] = index
+        if attempt:
+            result['attempts'] = attempt + 1
+        if cohort:
+            result['cohort'] = cohort['name']
+        return result
+
+class HttpClientPool:
+    """Minimal keep-alive HTTP/1.1 client that reuses connections per host (no browser)"""
+    def __init__(self, max_connections=100, timeout=30, max_redirects=10):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.idle = {}
+        self.ssl_context = ssl.create_default_context()
+    
+    async def _acquire(self, key):
+        idle = self.idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        
+        scheme, host, port = key
+        if scheme == 'https':
+            reader, writer = await asyncio.open_connection(host, port, ssl=self.ssl_context, server_hostname=host)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return reader, writer, False
+    
+    def _release(self, key, reader, writer):
+        idle = self.idle.setdefault(key, [])
+        if len(idle) < self.max_connections:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+    
+    async def _read_response(self, reader, method):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed before response')
+        version, status, *_ = status_line.decode('latin-1').split(' ', 2)
+        status = int(status)
+        
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip(), 16)
+                if size == 0:
+                    # Skip trailers
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        
+        return status, headers, body, keep_alive
+    
+    async def _send(self, method, url, headers):
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {parts.netloc}',
+            f'User-Agent: {USER_AGENT}',
+            'Accept: text/html,application/xhtml+xml,*/*;q=0.8',
+            'Accept-Encoding: gzip, deflate',
+            'Connection: keep-alive',
+        ]
+        for name, value in (headers or {}).items():
+            lines.append(f'{name}: {value}')
+        payload = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        
+        while True:
+            reader, writer, reused = await self._acquire(key)
+            try:
+                writer.write(payload)
+                await writer.drain()
+                status, resp_headers, body, keep_alive = await self._read_response(reader, method)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # The server may have dropped an idle keep-alive connection; retry on a fresh one
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            
+            if keep_alive:
+                self._release(key, reader, writer)
+            else:
+                writer.close()
+            return status, resp_headers, body
+    
+    async def request(self, url, method='GET', headers=None, follow_redirects=True):
+        """Send a request following redirects, returns (status, headers, body, final_url)"""
+        for _ in range(self.max_redirects + 1):
+            status, resp_headers, body = await asyncio.wait_for(self._send(method, url, headers), self.timeout)
+            if follow_redirects and status in REDIRECT_STATUSES and 'location' in resp_headers:
+                url = urljoin(url, resp_headers['location'])
+                if status == 303:
+                    method = 'GET'
+                continue
+            return status, resp_headers, body, url
+        raise RuntimeError(f'Too many redirects ({self.max_redirects})')
+    
+    async def close(self):
+        for connections in self.idle.values():
+            for _, writer in connections:
+                writer.close()
+        self.idle.clear()
+
+def extract_title(body, headers):
+    """Pull the <title> out of a (possibly compressed) HTML body"""
+    encoding = headers.get('content-encoding', '').lower()
+    try:
+        if encoding == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            body = zlib.decompress(body)
+    except zlib.error:
+        return ''
+    match = TITLE_RE.search(body)
+    return match.group(1).decode('utf-8', 'replace').strip() if match else ''
+
+async def send_http_request(client, url, bot_id, progress_tracker, verbose=False, headers=None):
+    """Send a single HTTP request through the pooled client and return the result"""
+    start_time = time.time()
+    
+    try:
+        if verbose and bot_id <= 5:
+            print(f"[Bot {bot_id}] Starting...")
+        
+        status, response_headers, body, current_url = await client.request(url, headers=headers)
+        title = extract_title(body, response_headers)
+        
+        elapsed = time.time() - start_time
+        
+        if verbose and bot_id <= 5:
+            print(f"[Bot {bot_id}] ✓ Status {status} ({elapsed:.2f}s) - {title[:40]}")
+        
+        return {
+            'bot_id': bot_id,
+            'status': status,
+            'elapsed': elapsed,
+            'success': 200 <= status < 400,
+            'title': title[:50],
+            'url': current_url
+        }
+        
+    except Exception as e:
+        elapsed = time.time() - start_time
+        error_msg = str(e) or type(e).__name__
+        
+        if verbose and bot_id <= 5:
+            print(f"[Bot {bot_id}] ✗ Error: {error_msg[:60]}")
+        
+        return {
+            'bot_id': bot_id,
+            'status': 'Error',
+            'elapsed': elapsed,
+            'success': False,
+            'error': error_msg[:200],
+            'error_type': classify_error(e)
+        }
+        
+    finally:
+        await progress_tracker.increment()
+
+async def record_har(url, har_file, headless=True):
+    """Load the target once in Chromium and save every request it made as a HAR file"""
+    from playwright.async_api import async_playwright
+    
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        try:
+            context = await browser.new_context(
+                viewport={'width': 1920, 'height': 1080},
+                user_agent=USER_AGENT,
+                record_har_path=har_file,
+                record_har_content='omit'
+            )
+            page = await context.new_page()
+            await page.goto(url, wait_until='load', timeout=30000)
+            # The HAR is written when the context closes
+            await context.close()
+        finally:
+            await browser.close()
+
+def url_origin(url):
+    """(scheme, host, port) of a URL, with the scheme's default port filled in"""
+    parts = urlsplit(url)
+    return parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80)
+
+def load_har_plan(har_file, third_party=False):
+    """Turn a recorded HAR into a replay plan of GET requests in original start order
+
+    Each entry lists as deps the indexes of the entries that had already finished when
+    it started, which reproduces the page's waterfall (a stylesheet's fonts wait for the
+    stylesheet, the document comes first) without hardcoding any timings.
+    Only requests to the origin of the first one (the page itself) are kept unless
+    third_party is set: a recorded page also hits CDNs, analytics and ad servers,
+    which are not the target and must not be load tested without their owners' consent.
+    """
+    with open(har_file) as f:
+        entries = json.load(f)['log']['entries']
+    
+    timed = []
+    for entry in entries:
+        request = entry['request']
+        if request['method'] != 'GET' or not request['url'].startswith(('http://', 'https://')):
+            continue
+        started = datetime.fromisoformat(entry['startedDateTime'].replace('Z', '+00:00')).timestamp()
+        timed.append((started, started + max(entry.get('time', 0), 0) / 1000, request['url']))
+    if not timed:
+        raise ValueError(f"{har_file} has no replayable GET requests")
+    timed.sort()
+    if not third_party:
+        origin = url_origin(timed[0][2])
+        timed = [entry for entry in timed if url_origin(entry[2]) == origin]
+    
+    first = timed[0][0]
+    plan = []
+    for index, (started, finished, url) in enumerate(timed):
+        deps = [other for other, (_, other_finished, _) in enumerate(timed[:index]) if other_finished <= started]
+        plan.append({'url': url, 'start': started - first, 'end': finished - first, 'deps': deps})
+    return plan
+
+async def send_har_request(client, plan, bot_id, progress_tracker, verbose=False, per_host=6, headers=None):
+    """Replay one recorded page load (document plus subresources) through the pooled client
+
+    Requests keep their recorded dependencies and at most per_host run at once per host,
+    like Chromium's connection limit. elapsed covers the whole page; subresource failures
+    are counted in the result but only a failed document fails the bot.
+    """
+    start_time = time.time()
+    host_limits = {}
+    outcomes = [None] * len(plan)
+    durations = [None] * len(plan)
+    
+    async def fetch(index, deps):
+        if deps:
+            await asyncio.wait(deps)
+        entry = plan[index]
+        host = urlsplit(entry['url']).netloc
+        limit = host_limits.setdefault(host, asyncio.Semaphore(per_host))
+        async with limit:
+            fetch_start = time.time()
+            outcomes[index] = await client.request(entry['url'], headers=headers, follow_redirects=False)
+            durations[index] = time.time() - fetch_start
+    
+    try:
+        if verbose and bot_id <= 5:
+            print(f"[Bot {bot_id}] Starting...")
+        
+        tasks = []
+        for index, entry in enumerate(plan):
+            tasks.append(asyncio.create_task(fetch(index, [tasks[dep] for dep in entry['deps']])))
+        done = await asyncio.gather(*tasks, return_exceptions=True)
+        elapsed = time.time() - start_time
+        
+        if isinstance(done[0], BaseException):
+            raise done[0]
+        status, headers, body, current_url = outcomes[0]
+        title = extract_title(body, headers)
+        failed_resources = sum(1 for outcome, error in zip(outcomes[1:], done[1:])
+                               if isinstance(error, BaseException) or outcome[0] >= 400)
+        resource_timings = []
+        for entry, outcome, duration in zip(plan[1:], outcomes[1:], durations[1:]):
+            if outcome is None or duration is None:
+                resource_timings.append((entry['url'], 'har', 0, 0, None, 0))
+            else:
+                resource_timings.append((entry['url'], 'har', len(outcome[2]), len(outcome[2]), duration, outcome[0]))
+        
+        if verbose and bot_id <= 5:
+            print(f"[Bot {bot_id}] ✓ Status {status} ({elapsed:.2f}s, {len(plan)} requests) - {title[:40]}")
+        
+        return {
+            'bot_id': bot_id,
+            'status': status,
+            'elapsed': elapsed,
+            'success': 200 <= status < 400,
+            'title': title[:50],
+            'url': current_url,
+            'resources': len(plan) - 1,
+            'failed_resources': failed_resources,
+            'resource_timings': resource_timings
+        }
+        
+    except Exception as e:
+        elapsed = time.time() - start_time
+        error_msg = str(e) or type(e).__name__
+        
+        if verbose and bot_id <= 5:
+            print(f"[Bot {bot_id}] ✗ Error: {error_msg[:60]}")
+        
+        return {
+            'bot_id': bot_id,
+            'status': 'Error',
+            'elapsed': elapsed,
+            'success': False,
+            'error': error_msg[:200],
+            'error_type': classify_error(e)
+        }
+        
+    finally:
+        await progress_tracker.increment()
+
+def new_run_id():
+    """Short random tag making a run's request ids unique across runs"""
+    return os.urandom(4).hex()
+
+def request_id(run_id, bot_id):
+    """Request id sent for a bot: the run tag and the bot id, so the store only needs the tag"""
+    return f"{run_id}-{bot_id}"
+
+def load_url_mix(path):
+    """Load a weighted URL set as a list of [url, weight]
+
+    Accepts a sitemap (.xml, <priority> becomes the weight), JSON (a list of URLs,
+    [url, weight] pairs or {url, weight} objects) or plain text with one
+    "url [weight]" per line and # comments. URLs may be relative to the target.
+    """
+    entries = []
+    if path.endswith('.xml'):
+        import xml.etree.ElementTree as ElementTree
+        for _, element in ElementTree.iterparse(path):
+            if element.tag.rsplit('}', 1)[-1] == 'url':
+                fields = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in element}
+                if fields.get('loc'):
+                    entries.append([fields['loc'], float(fields.get('priority') or 0.5)])
+                element.clear()
+    elif path.endswith('.json'):
+        with open(path) as f:
+            for entry in json.load(f):
+                if isinstance(entry, str):
+                    entries.append([entry, 1.0])
+                elif isinstance(entry, dict):
+                    entries.append([entry['url'], float(entry.get('weight', 1.0))])
+                else:
+                    entries.append([entry[0], float(entry[1]) if len(entry) > 1 else 1.0])
+    else:
+        with open(path) as f:
+            for line in f:
+                fields = line.split('#', 1)[0].split()
+                if fields:
+                    entries.append([fields[0], float(fields[1]) if len(fields) > 1 else 1.0])
+    if not entries:
+        raise ValueError(f"No URLs in {path}")
+    return entries
+
+def weighted_index(cum_weights, total, bot_id, multiplier=0x9E3779B97F4A7C15):
+    """Index into cumulative weights chosen by bot id
+
+    Fibonacci hashing (bot_id * multiplier mod 2**64) spreads consecutive ids evenly
+    over [0, 1); different multipliers give choices independent of each other.
+    """
+    fraction = ((bot_id * multiplier) & 0xFFFFFFFFFFFFFFFF) / 2**64
+    return min(bisect.bisect(cum_weights, fraction * total), len(cum_weights) - 1)
+
+class UrlMix:
+    """Weighted URL set bots sample their target from
+
+    pick(bot_id) is a deterministic function of the bot id (a hash into the
+    cumulative weights, O(log n)), so a bot gets the same URL whichever worker or
+    agent runs it. Relative URLs are resolved against base_url.
+    """
+    def __init__(self, entries, base_url=''):
+        self.urls = []
+        self.cum_weights = []
+        total = 0.0
+        for url, weight in entries:
+            if weight <= 0:
+                continue
+            total += weight
+            self.urls.append(urljoin(base_url, url))
+            self.cum_weights.append(total)
+        if not self.urls:
+            raise ValueError("The URL mix has no entries with a positive weight")
+        self.total = total
+    
+    def __len__(self):
+        return len(self.urls)
+    
+    def pick(self, bot_id):
+        return self.urls[weighted_index(self.cum_weights, self.total, bot_id)]
+
+URL_ID_RE = re.compile(r'^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{16,})$')
+
+def url_pattern(url):
+    """Endpoint pattern of a URL: ids in the path become {id}, query values are dropped
+
+    e.g. https://shop.test/products/123?ref=x -> shop.test/products/{id}?ref
+    """
+    parts = urlsplit(url)
+    path = '/'.join('{id}' if URL_ID_RE.match(segment) else segment for segment in (parts.path or '/').split('/'))
+    query = '&'.join(sorted({field.split('=', 1)[0] for field in parts.query.split('&') if field}))
+    return f"{parts.netloc}{path}{'?' + query if query else ''}"
+
+def constant_profile(rps, duration):
+    """Open-model profile: a steady arrival rate"""
+    return [(duration, rps, rps)]
+
+def ramp_profile(start_rps, end_rps, duration):
+    """Open-model profile: arrival rate changing linearly from start_rps to end_rps"""
+    return [(duration, start_rps, end_rps)]
+
+def step_profile(stages):
+    """Open-model profile from [(duration, rps), ...] stages held one after another"""
+    return [(duration, rps, rps) for duration, rps in stages]
+
+def spike_profile(base_rps, spike_rps, duration, spike_start, spike_duration):
+    """Open-model profile: base_rps with a burst to spike_rps starting at spike_start"""
+    return [
+        (spike_start, base_rps, base_rps),
+        (spike_duration, spike_rps, spike_rps),
+        (duration - spike_start - spike_duration, base_rps, base_rps),
+    ]
+
+def scale_profile(profile, factor):
+    return [(duration, start_rps * factor, end_rps * factor) for duration, start_rps, end_rps in profile]
+
+def profile_request_count(profile):
+    """Number of arrivals the profile schedules"""
+    return math.ceil(sum((start_rps + end_rps) / 2 * duration for duration, start_rps, end_rps in profile) - 1e-9)
+
+def arrival_times(profile):
+    """Yield the intended send offset (seconds from start) of every request in the profile
+
+    A profile is a list of (duration, start_rps, end_rps) stages with the rate linear
+    inside each stage; request k is due when the integrated rate reaches k.
+    """
+    offset = 0.0
+    scheduled = 0.0
+    k = 0
+    for duration, start_rps, end_rps in profile:
+        if duration <= 0:
+            continue
+        area = (start_rps + end_rps) / 2 * duration
+        slope = (end_rps - start_rps) / duration
+        while k < scheduled + area - 1e-9:
+            target = k - scheduled
+            if slope:
+                t = (-start_rps + math.sqrt(max(0.0, start_rps * start_rps + 2 * slope * target))) / slope
+            else:
+                t = target / start_rps
+            yield offset + t
+            k += 1
+        scheduled += area
+        offset += duration
+
+class RunOptions:
+    """How the bots of a run are issued and recorded, handed down unchanged to every runner
+
+    Keyword arguments override DEFAULTS; unknown names raise TypeError. Sharded,
+    distributed and capacity runs derive their per-worker or per-stage settings with
+    replace(), and to_dict() / from_dict() carry them across processes and hosts.
+    """
+    DEFAULTS = {
+        'max_concurrent': 50,  # Bots in flight at once (virtual users in a soak)
+        'verbose': False,  # Log the first 5 bots
+        'headless': True,
+        'engine': 'browser',  # 'browser' (Chromium), 'http' (pooled keep-alive client) or 'har' (replay har_file)
+        'keep_results': True,  # Return every result dict; False keeps only the aggregates
+        'context_pool': False,  # Check bots out of a warm ContextPool sized to max_concurrent
+        'pool_reset': ('cookies', 'storage'),  # State wiped between pooled bots (see ContextPool)
+        'arrival_profile': None,  # Open model: issue bots at this rate (see arrival_times)
+        'metrics_interval': 1.0,  # Seconds per live window (see MetricsReporter)
+        'metrics_file': None,  # Live windows as JSONL
+        'metrics_port': None,  # Prometheus text at /metrics during the run
+        'results_file': None,  # Append every result to a ResultStore
+        'scenario': None,  # Journey steps every bot walks (browser engine, see normalize_scenario)
+        'max_client_rss_mb': None,  # Hold new bots back while Chromium RSS is above this (needs psutil)
+        'max_client_cpu': None,  # ... or while machine CPU is above this percent
+        'browsers': 1,  # Browser instances per process
+        'browser_strategy': 'round_robin',  # or 'least_loaded' (see BrowserSet)
+        'har_file': None,  # Page load the har engine replays (see send_har_request)
+        'har_third_party': False,  # Also replay the HAR's requests to other origins (see load_har_plan)
+        'duration': None,  # Soak: virtual users keep taking bot ids until this many seconds passed
+        'url_mix': None,  # [url, weight] entries each bot draws its target from (see UrlMix)
+        'warmup_requests': 0,  # First results recorded into stats.warmup instead of the run
+        'warmup_seconds': 0,  # ... as are results completing in the first seconds
+        'network_cohorts': None,  # Emulated networks the bots are spread over (see normalize_cohorts)
+        'request_id_header': None,  # Header carrying request_id(run_id, bot_id) (see join_access_log)
+        'run_id': None,  # Run tag of the request ids
+        'crash_retries': 2,  # Requeues of a bot taken down by a browser crash (see BrowserSet)
+        'max_browser_restarts': 10,  # Relaunches per process before a crashed browser stays down
+        # Seconds a browser bot may wait for the load event and network idle before its timings,
+        # vitals and resources are read (see settle_page); 0 reads them at DOMContentLoaded, cut short.
+        # Not part of elapsed, but the bot holds its slot while it waits, so it lowers throughput
+        'page_settle': 0,
+    }
+    
+    def __init__(self, **options):
+        unknown = set(options) - set(self.DEFAULTS)
+        if unknown:
+            raise TypeError(f"Unknown run options: {', '.join(sorted(unknown))}")
+        self.__dict__.update(self.DEFAULTS, **options)
+    
+    def __repr__(self):
+        changed = ', '.join(f"{name}={value!r}" for name, value in self.to_dict().items()
+                            if value != self.DEFAULTS[name])
+        return f"RunOptions({changed})"
+    
+    def replace(self, **changes):
+        return RunOptions(**dict(self.to_dict(), **changes))
+    
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.DEFAULTS}
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+    
+    def normalized(self):
+        """Checked copy with the scenario, URL mix and cohorts in the form run_bots takes
+
+        Every runner calls this before its options reach run_bots, a worker or an agent:
+        a url_mix path is read into [url, weight] pairs here (agents may not have the file),
+        and options the engine cannot run are rejected before anything starts.
+        """
+        options = self
+        if options.engine not in ('browser', 'http', 'har'):
+            raise ValueError(f"Unknown engine: {options.engine!r} (expected 'browser', 'http' or 'har')")
+        if options.engine == 'har' and not options.har_file:
+            raise ValueError("The har engine needs a har_file")
+        if options.scenario:
+            if options.engine != 'browser':
+                raise ValueError("Scenarios need the browser engine")
+            options = options.replace(scenario=normalize_scenario(options.scenario))
+        if options.url_mix:
+            if options.engine == 'har':
+                raise ValueError("The har engine replays one recorded page and cannot take a URL mix")
+            url_mix = load_url_mix(options.url_mix) if isinstance(options.url_mix, str) else options.url_mix
+            options = options.replace(url_mix=[[entry, 1.0] if isinstance(entry, str) else list(entry)
+                                               for entry in url_mix])
+        if options.network_cohorts:
+            if options.engine != 'browser':
+                raise ValueError("Network cohorts are emulated in the browser and need the browser engine")
+            options = options.replace(network_cohorts=normalize_cohorts(options.network_cohorts))
+        if options.duration and options.arrival_profile:
+            raise ValueError("duration and arrival_profile are mutually exclusive (a profile sets its own length)")
+        return options
+
+async def run_bots(url, bot_ids, progress_tracker, stats, options=None, on_ready=None, on_done=None, **overrides):
+    """Run the given bots on this event loop, recording each result into stats as it finishes
+
+    options is a RunOptions (defaults when None) saying how the bots are issued and
+    what is recorded; any other keyword overrides that field of it. on_ready is awaited once the engine is set up, right before
+    the first request, and on_done right after the last result, before pools and
+    browsers are torn down; together they bracket the measured part of the run.
+    Returns the result dicts, or an empty list when options.keep_results is False.
+    """
+    options = (options or RunOptions()).replace(**overrides)
+    # Create semaphore to limit concurrent operations
+    semaphore = asyncio.Semaphore(options.max_concurrent)
+    
+    reporter = MetricsReporter(stats, progress_tracker, options.metrics_interval, options.metrics_file,
+                               options.metrics_port)
+    store = ResultStore(options.results_file) if options.results_file else None
+    
+    governor = None
+    if options.max_client_rss_mb or options.max_client_cpu:
+        governor = ResourceGovernor(options.max_client_rss_mb, options.max_client_cpu)
+    mix = UrlMix(options.url_mix, url) if options.url_mix else None
+    
+    def target(bot_id):
+        return mix.pick(bot_id) if mix else url
+    
+    def headers(bot_id):
+        return {options.request_id_header: request_id(options.run_id, bot_id)} if options.request_id_header else None
+    
+    cohort_weights = list(itertools.accumulate(cohort['weight'] for cohort in options.network_cohorts or ()))
+    
+    def cohort(bot_id):
+        if not options.network_cohorts:
+            return None
+        # Own multiplier so the cohort is independent of the URL the bot drew
+        return options.network_cohorts[weighted_index(cohort_weights, cohort_weights[-1], bot_id,
+                                                      multiplier=0x6A09E667F3BCC909)]
+    
+    warming_up = bool(options.warmup_requests or options.warmup_seconds)
+    started = None
+    
+    def record(result):
+        nonlocal warming_up
+        if mix:
+            result['target'] = target(result['bot_id'])
+        if warming_up:
+            warmup = stats.warmup_stats()
+            if warmup.total < options.warmup_requests or time.time() - started < options.warmup_seconds:
+                result['warmup'] = True
+            else:
+                warming_up = False
+                stats.warmup_time = time.time() - started
+        if result.get('warmup'):
+            stats.warmup.record(result)
+        else:
+            stats.record(result)
+        # Aggregated into the resource index; kept results stay small
+        result.pop('resource_timings', None)
+        reporter.record(result)
+        if store is not None:
+            store.record(result)
+    
+    async def run_all(request_fn):
+        async def limited_request(bot_id):
+            async with semaphore:
+                if governor:
+                    await governor.wait()
+                result = await request_fn(bot_id)
+            record(result)
+            return result if options.keep_results else None
         
-        return result
+        nonlocal started
+        if on_ready:
+            await on_ready()
+        started = time.time()
+        await reporter.start()
+        if governor:
+            await governor.start()
+        try:
+            if options.arrival_profile:
+                results = await run_open_model(request_fn)
+            elif options.duration:
+                results = await run_for_duration(request_fn)
+            else:
+                # Execute all requests concurrently
+                results = await asyncio.gather(*(limited_request(i) for i in bot_ids))
+                results = list(results) if options.keep_results else []
+            if on_done:
+                await on_done()
+            return results
+        finally:
+            if warming_up:
+                # The whole run fell inside the warm-up
+                stats.warmup_time = time.time() - started
+            if governor:
+                await governor.stop()
+                stats.add_client_stats(governor.stats)
+            await reporter.stop()
+            if store is not None:
+                store.close()
+    
+    async def run_for_duration(request_fn):
+        # Closed model bounded by time: each virtual user loops until the deadline
+        results = []
+        next_ids = iter(bot_ids)
+        deadline = time.time() + options.duration
         
-    except Exception as e:
-        elapsed = time.time() - start_time
-        error_msg = str(e)
+        async def virtual_user():
+            for bot_id in next_ids:
+                if time.time() >= deadline:
+                    break
+                async with semaphore:
+                    if governor:
+                        await governor.wait()
+                    result = await request_fn(bot_id)
+                record(result)
+                if options.keep_results:
+                    results.append(result)
         
-        if verbose and bot_id <= 5:
-            print(f"[Bot {bot_id}] ✗ Error: {error_msg[:60]}")
+        await asyncio.gather(*(virtual_user() for _ in range(options.max_concurrent)))
+        results.sort(key=lambda r: r['bot_id'])
+        return results
+    
+    async def run_open_model(request_fn):
+        # Requests go out on the profile's schedule regardless of how fast earlier ones
+        # complete; any wait past the intended send time is charged to the request
+        results = []
+        pending = set()
         
-        return {
-            'bot_id': bot_id,
-            'status': 'Error',
-            'elapsed': elapsed,
-            'success': False,
-            'error': error_msg[:200]
-        }
+        async def scheduled_request(bot_id, intended):
+            async with semaphore:
+                if governor:
+                    await governor.wait()
+                lag = max(0.0, time.time() - intended)
+                result = await request_fn(bot_id)
+            result['schedule_lag'] = lag
+            record(result)
+            if options.keep_results:
+                results.append(result)
         
-    finally:
-        # Clean up
-        if page:
-            await page.close()
-        if context:
-            await context.close()
+        start_time = time.time()
+        for offset, bot_id in zip(arrival_times(options.arrival_profile), bot_ids):
+            intended = start_time + offset
+            delay = intended - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(scheduled_request(bot_id, intended))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
         
-        await progress_tracker.increment()
-
-async def simulate_concurrent_requests(url, num_bots=100, max_concurrent=50, verbose=False, headless=True):
-    """Simulate multiple bots hitting a site concurrently using Playwright"""
-    print(f"\n{'='*70}")
-    print(f"🔬 PLAYWRIGHT LOAD TEST CONFIGURATION")
-    print(f"{'='*70}")
-    print(f"📅 Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"🎯 Target URL: {url}")
-    print(f"🤖 Number of bots: {num_bots}")
-    print(f"🔧 Max concurrent browsers: {max_concurrent}")
-    print(f"👁️  Headless mode: {headless}")
-    print(f"{'='*70}\n")
+        await asyncio.gather(*pending)
+        results.sort(key=lambda r: r['bot_id'])
+        return results
     
-    progress_tracker = ProgressTracker(num_bots)
+    if options.engine == 'har':
+        # Recorded page load replayed per bot over pooled connections, no browser
+        plan = load_har_plan(options.har_file, third_party=options.har_third_party)
+        client = HttpClientPool(max_connections=options.max_concurrent * 6)
+        try:
+            return await run_all(lambda bot_id: send_har_request(client, plan, bot_id, progress_tracker,
+                                                                 options.verbose, headers=headers(bot_id)))
+        finally:
+            await client.close()
     
-    print(f"🚀 Launching {num_bots} concurrent requests...")
-    print("-" * 70)
+    if options.engine == 'http':
+        # Pooled keep-alive connections, no browser at all
+        client = HttpClientPool(max_connections=options.max_concurrent)
+        try:
+            return await run_all(lambda bot_id: send_http_request(client, target(bot_id), bot_id, progress_tracker,
+                                                                  options.verbose, headers(bot_id)))
+        finally:
+            await client.close()
     
-    start_time = time.time()
-    results = []
+    from playwright.async_api import async_playwright
     
     async with async_playwright() as p:
-        # Launch browser (reuse single browser instance)
-        browser = await p.chromium.launch(headless=headless)
-        
-        # Create semaphore to limit concurrent operations
-        semaphore = asyncio.Semaphore(max_concurrent)
-        
-        async def limited_request(bot_id):
-            async with semaphore:
-                return await send_request(browser, url, bot_id, progress_tracker, verbose)
-        
-        # Execute all requests concurrently
-        tasks = [limited_request(i) for i in range(1, num_bots + 1)]
-        results = await asyncio.gather(*tasks)
+        # Launch the browser instances (reused by every bot)
+        def launch():
+            return p.chromium.launch(headless=options.headless)
         
-        await browser.close()
+        launched = await asyncio.gather(*(launch() for _ in range(options.browsers)))
+        browser_set = BrowserSet(launched, options.browser_strategy, launch=launch, max_retries=options.crash_retries,
+                                 max_restarts=options.max_browser_restarts, settle=options.page_settle)
+        try:
+            if options.context_pool:
+                # One warm context per concurrency slot, split across the options.browsers and
+                # created before the clock starts
+                per_browser = -(-options.max_concurrent // options.browsers)
+                browser_set.pools = [ContextPool(browser, per_browser, reset=options.pool_reset)
+                                     for browser in launched]
+                await asyncio.gather(*(pool.start() for pool in browser_set.pools))
+            return await run_all(lambda bot_id: browser_set.send(target(bot_id), bot_id, progress_tracker,
+                                                                 options.verbose, options.scenario, cohort(bot_id),
+                                                                 headers(bot_id)))
+        finally:
+            for pool in browser_set.pools:
+                if pool:
+                    stats.add_pool_stats(pool.stats)
+                    await pool.close()
+            for pool in browser_set.retired_pools:
+                stats.add_pool_stats(pool.stats)
+            stats.add_browser_peaks(browser_set.peak_active)
+            if browser_set.crash_stats['crashes']:
+                stats.add_crash_stats(browser_set.crash_stats)
+            for browser in browser_set.browsers:
+                await browser.close()
+
+def split_evenly(total, parts):
+    """total as parts integers that differ by at most one and sum to total, larger ones first"""
+    return [total // parts + (index < total % parts) for index in range(parts)]
+
+def plan_shards(num_bots, workers, options):
+    """Split a run into per-worker bot id ranges and RunOptions (one each, same order)
+
+    max_concurrent and warmup_requests are split so the shards add up to exactly the
+    run's (each shard keeps at least 1 concurrent bot), and any arrival_profile rate
+    is divided evenly between the workers.
+    """
+    if options.duration:
+        # Unbounded interleaved id ranges, every worker runs until the deadline
+        shards = [range(worker_id, sys.maxsize, workers) for worker_id in range(1, workers + 1)]
+    elif options.arrival_profile:
+        # Each worker runs the profile at 1/workers of the rate; bot ids interleave
+        options = options.replace(arrival_profile=scale_profile(options.arrival_profile, 1 / workers))
+        per_worker = profile_request_count(options.arrival_profile)
+        shards = [range(worker_id, worker_id + per_worker * workers, workers)
+                  for worker_id in range(1, workers + 1)]
+    else:
+        # Contiguous bot id ranges keep ids global; fewer bots than workers leaves some idle
+        shards = []
+        start = 1
+        for size in split_evenly(num_bots, workers):
+            if size:
+                shards.append(range(start, start + size))
+            start += size
+    shard_options = [options.replace(max_concurrent=max(1, max_concurrent), warmup_requests=warmup_requests)
+                     for max_concurrent, warmup_requests in zip(split_evenly(options.max_concurrent, len(shards)),
+                                                                split_evenly(options.warmup_requests, len(shards)))]
+    return shards, shard_options
+
+WORKER_START_TIMEOUT = 600  # Seconds a worker waits for the others to get their engines up
+WORKER_EXIT_GRACE = 5.0  # Seconds a dead worker's result may still be in flight before the run fails
+
+def worker_part_path(results_file, worker_id):
+    return f"{results_file}.worker{worker_id}"
+
+def _shard_worker(worker_id, bot_ids, url, options, barrier, queue):
+    """Entry point of a sharded worker process: own event loop, own browser/client
+
+    Puts (worker_id, results, stats, span, error) on queue, span being the worker's own
+    (start, end) of the measured run: from the common start to its last result.
+    """
+    span = [None, None]
     
-    total_time = time.time() - start_time
+    async def wait_for_start():
+        # Block until every worker has its engine up, so all shards start together
+        await asyncio.get_running_loop().run_in_executor(None, barrier.wait, WORKER_START_TIMEOUT)
+        span[0] = time.time()
     
-    print("-" * 70)
-    print(f"✓ All requests completed!\n")
+    async def stop_clock():
+        span[1] = time.time()
     
-    # Analyze results
-    successful = sum(1 for r in results if r['success'])
-    failed = num_bots - successful
+    progress_tracker = ProgressTracker(None if options.duration else len(bot_ids), label=f"Worker {worker_id}")
+    stats = RunStats()
+    # Each worker streams its own metrics: file suffixed and port offset by worker id
+    if options.metrics_file:
+        options = options.replace(metrics_file=f"{options.metrics_file}.worker{worker_id}")
+    if options.metrics_port:
+        options = options.replace(metrics_port=options.metrics_port + worker_id - 1)
+    if options.results_file:
+        options = options.replace(results_file=worker_part_path(options.results_file, worker_id))
+    try:
+        results = asyncio.run(run_bots(url, bot_ids, progress_tracker=progress_tracker, stats=stats,
+                                       options=options, on_ready=wait_for_start, on_done=stop_clock))
+        queue.put((worker_id, results, stats, tuple(span), None))
+    except BaseException as e:
+        barrier.abort()
+        queue.put((worker_id, [], stats, None, f"{type(e).__name__}: {e}"))
+
+def run_sharded(url, num_bots, workers, options):
+    """Split the bots across worker processes, start them in lockstep and merge their results
+
+    options is the run's RunOptions; max_concurrent is split across the workers.
+    Returns (results, stats, total_time) where total_time runs from the common start to the
+    last result, as timed by the workers themselves (no teardown or result transfer in it).
+    A worker that dies without reporting fails the run instead of leaving it waiting.
+    """
+    shards, shard_options = plan_shards(num_bots, workers, options)
     
-    if not results:
-        print("No results to analyze!")
-        return results
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(len(shards))
+    queue = ctx.Queue()
+    
+    processes = [
+        ctx.Process(target=_shard_worker, daemon=True,
+                    args=(worker_id, shard, url, worker_options.replace(verbose=worker_options.verbose and worker_id == 1),
+                          barrier, queue))
+        for worker_id, (shard, worker_options) in enumerate(zip(shards, shard_options), 1)
+    ]
+    for process in processes:
+        process.start()
+    
+    results = []
+    stats = RunStats()
+    errors = []
+    spans = []
+    pending = dict(enumerate(processes, 1))
+    dead_since = {}
+    while pending:
+        try:
+            worker_id, shard_results, shard_stats, span, error = queue.get(timeout=1.0)
+        except Empty:
+            # A dead worker's last message may still be on the way; past the grace period it never comes
+            now = time.time()
+            dead = [worker_id for worker_id, process in pending.items()
+                    if not process.is_alive() and now - dead_since.setdefault(worker_id, now) >= WORKER_EXIT_GRACE]
+            if dead:
+                errors.extend(f"Worker {worker_id}: exited with code {pending[worker_id].exitcode} without reporting"
+                              for worker_id in dead)
+                # The run is incomplete either way: stop the other workers rather than wait them out
+                for process in pending.values():
+                    process.terminate()
+                break
+            continue
+        pending.pop(worker_id, None)
+        results.extend(shard_results)
+        stats.merge(shard_stats)
+        if span:
+            spans.append(span)
+        if error:
+            errors.append(f"Worker {worker_id}: {error}")
+    total_time = max(end for _, end in spans) - min(start for start, _ in spans) if spans else 0.0
+    
+    for process in processes:
+        process.join()
     
-    elapsed_times = [r['elapsed'] for r in results]
-    avg_response_time = statistics.mean(elapsed_times)
-    median_time = statistics.median(elapsed_times)
-    min_time = min(elapsed_times)
-    max_time = max(elapsed_times)
+    if errors:
+        raise RuntimeError("Sharded run failed - " + "; ".join(errors))
     
-    # Calculate percentiles
-    sorted_times = sorted(elapsed_times)
-    p90_time = sorted_times[int(len(sorted_times) * 0.9)]
-    p95_time = sorted_times[int(len(sorted_times) * 0.95)]
-    p99_time = sorted_times[int(len(sorted_times) * 0.99)]
+    results.sort(key=lambda r: r['bot_id'])
+    return results, stats, total_time
+
+def format_duration(seconds):
+    """Compact h/m/s rendering for window offsets, e.g. 1h05m, 12m30s, 45s"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+def print_summary(stats, total_time):
+    """Print the load test results summary"""
+    num_bots = stats.total
+    histogram = stats.histogram
     
-    status_codes = {}
-    for r in results:
-        status = r['status']
-        status_codes[status] = status_codes.get(status, 0) + 1
+    # Analyze results
+    successful = stats.successful
+    failed = num_bots - successful
+    # Warm-up samples are reported on their own below; rates cover steady state only
+    steady_time = max(total_time - stats.warmup_time, 1e-9) if stats.warmup else total_time
     
     # Print detailed summary
     print(f"{'='*70}")
@@ -157,32 +2659,1348 @@ async def simulate_concurrent_requests(url, num_bots=100, max_concurrent=50, ver
     print(f"{'='*70}")
     print(f"\n⏱️  TIMING METRICS:")
     print(f"   Total duration: {total_time:.2f} seconds")
-    print(f"   Throughput: {num_bots/total_time:.2f} requests/second")
+    if stats.warmup:
+        print(f"   Warm-up: {stats.warmup_time:.2f} seconds ({stats.warmup.total} requests, excluded below)")
+    print(f"   Throughput: {num_bots/steady_time:.2f} requests/second")
     
     print(f"\n✅ SUCCESS RATE:")
     print(f"   Successful: {successful}/{num_bots} ({successful/num_bots*100:.1f}%)")
     print(f"   Failed: {failed}/{num_bots} ({failed/num_bots*100:.1f}%)")
     
+    if stats.resources:
+        print(f"   Subresources: {stats.resources} fetched, {stats.failed_resources} failed")
+    
     print(f"\n⏲️  RESPONSE TIME STATISTICS:")
-    print(f"   Average:  {avg_response_time:.3f}s")
-    print(f"   Median:   {median_time:.3f}s")
-    print(f"   Min:      {min_time:.3f}s")
-    print(f"   Max:      {max_time:.3f}s")
-    print(f"   P90:      {p90_time:.3f}s")
-    print(f"   P95:      {p95_time:.3f}s")
-    print(f"   P99:      {p99_time:.3f}s")
+    print(f"   Average:  {histogram.mean:.3f}s")
+    print(f"   Median:   {histogram.percentile(50):.3f}s")
+    print(f"   Min:      {histogram.min:.3f}s")
+    print(f"   Max:      {histogram.max:.3f}s")
+    print(f"   P90:      {histogram.percentile(90):.3f}s")
+    print(f"   P95:      {histogram.percentile(95):.3f}s")
+    print(f"   P99:      {histogram.percentile(99):.3f}s")
+    print(f"   P99.9:    {histogram.percentile(99.9):.3f}s")
+    
+    if stats.phase_histograms:
+        print(f"\n🔍 NAVIGATION TIMING BREAKDOWN:")
+        print(f"   {'Phase':10} {'Avg':>8} {'P50':>8} {'P90':>8} {'P99':>8} {'Max':>8}")
+        # Every timed bot has a ttfb; dom/load are missing for pages read before those events
+        timed = max(phase_histogram.count for phase_histogram in stats.phase_histograms.values())
+        unfinished = []
+        for phase in TIMING_PHASES:
+            phase_histogram = stats.phase_histograms.get(phase)
+            if phase_histogram and phase_histogram.count:
+                print(f"   {phase:10} {phase_histogram.mean:7.3f}s {phase_histogram.percentile(50):7.3f}s "
+                      f"{phase_histogram.percentile(90):7.3f}s {phase_histogram.percentile(99):7.3f}s "
+                      f"{phase_histogram.max:7.3f}s")
+            elif phase in ('dom', 'load'):
+                print(f"   {phase:10} {'n/a':>8}  (no bot's page reached this event before it was read)")
+            if phase in ('dom', 'load'):
+                count = phase_histogram.count if phase_histogram else 0
+                if 0 < count < timed:
+                    unfinished.append(f"{phase} missing for {timed - count} of {timed} bots")
+        if unfinished or 'load' not in stats.phase_histograms:
+            print(f"   ⚠️  {'; '.join(unfinished) or 'load phase unavailable'}: pages were read before their "
+                  f"load event (set page_settle)")
+    
+    if stats.vitals_histograms:
+        print_vitals(stats)
+    
+    if stats.step_histograms:
+        print(f"\n🧭 JOURNEY STEPS:")
+        print(f"   {'Step':28} {'Runs':>6} {'Fail':>5} {'Avg':>8} {'P50':>8} {'P90':>8} {'P99':>8}")
+        for name, step_histogram in stats.step_histograms.items():
+            failed_runs = sum(stats.step_errors.get(name, {}).values())
+            print(f"   {name[:28]:28} {step_histogram.count:6} {failed_runs:5} {step_histogram.mean:7.3f}s "
+                  f"{step_histogram.percentile(50):7.3f}s {step_histogram.percentile(90):7.3f}s "
+                  f"{step_histogram.percentile(99):7.3f}s")
+        for name, errors in stats.step_errors.items():
+            print(f"\n   ✗ {name}:")
+            for category, count in sorted(errors.items(), key=lambda item: -item[1])[:3]:
+                print(f"     {count:5} × {ERROR_TYPES.get(category, category)}")
+    
+    warmup = stats.warmup
+    if warmup and warmup.total:
+        warmup_histogram = warmup.histogram
+        print(f"\n🔥 WARM-UP (excluded from the numbers above):")
+        print(f"   {'':10} {'Requests':>8} {'Errors':>7} {'Avg':>8} {'P50':>8} {'P90':>8} {'P99':>8}")
+        for label, part in (('Warm-up', warmup), ('Steady', stats)):
+            part_histogram = part.histogram
+            print(f"   {label:10} {part.total:8} {(part.total - part.successful) / part.total * 100 if part.total else 0:6.1f}% "
+                  f"{part_histogram.mean:7.3f}s {part_histogram.percentile(50):7.3f}s "
+                  f"{part_histogram.percentile(90):7.3f}s {part_histogram.percentile(99):7.3f}s")
+        if histogram.count and warmup_histogram.percentile(50) > histogram.percentile(50) * 1.5:
+            print(f"   Warm-up median was {warmup_histogram.percentile(50) / histogram.percentile(50):.1f}x steady state")
+    
+    lag = stats.lag_histogram
+    if lag.count:
+        print(f"\n🕒 OPEN-MODEL SCHEDULING (response times measured from intended send time):")
+        print(f"   Schedule lag: avg {lag.mean:.3f}s  P50 {lag.percentile(50):.3f}s  "
+              f"P99 {lag.percentile(99):.3f}s  Max {lag.max:.3f}s")
+    
+    setup = stats.setup_histogram
+    if setup.count or stats.pool:
+        print(f"\n🧰 CONTEXT SETUP (excluded from response times):")
+        if stats.pool:
+            print(f"   Pool warm-up: {stats.pool['warmup_time']:.2f}s for {stats.pool['created']} contexts")
+            print(f"   Recycled: {stats.pool['recycled']}  Replaced: {stats.pool['replaced']}  "
+                  f"Reset time: {stats.pool['reset_time']:.2f}s")
+        if setup.count:
+            print(f"   Per-bot setup: avg {setup.mean:.3f}s  P50 {setup.percentile(50):.3f}s  "
+                  f"P99 {setup.percentile(99):.3f}s")
+    
+    if len(stats.browsers) > 1:
+        print(f"\n🌐 PER-BROWSER:")
+        print(f"   {'Browser':>8} {'Bots':>7} {'Errors':>7} {'Peak':>6} {'Avg':>8} {'P50':>8} {'P99':>8}")
+        for index, browser in sorted(stats.browsers.items()):
+            browser_histogram = browser['histogram']
+            print(f"   {index + 1:8} {browser_histogram.count:7} {browser['errors']:7} {browser['peak_active']:6} "
+                  f"{browser_histogram.mean:7.3f}s {browser_histogram.percentile(50):7.3f}s "
+                  f"{browser_histogram.percentile(99):7.3f}s")
+    
+    if len(stats.windows.windows) > 1:
+        rows = stats.windows.rows(max_rows=30)
+        print(f"\n🕒 OVER TIME ({rows[0]['width']:g}s windows):")
+        print(f"   {'Start':>8} {'Requests':>9} {'Req/s':>8} {'Errors':>7} {'P50':>8} {'P99':>8}")
+        first_start = rows[0]['start']
+        for row in rows:
+            print(f"   {'+' + format_duration(row['start'] - first_start):>8} {row['requests']:9} "
+                  f"{row['rps']:8.1f} {row['error_rate']*100:6.1f}% "
+                  f"{row['p50']:7.3f}s {row['p99']:7.3f}s")
+        drift = stats.windows.drift()
+        if drift:
+            early, late = drift
+            print(f"   Drift (first → last third): P50 {early['p50']:.3f}s → {late['p50']:.3f}s  "
+                  f"P99 {early['p99']:.3f}s → {late['p99']:.3f}s  "
+                  f"errors {early['error_rate']*100:.1f}% → {late['error_rate']*100:.1f}%  "
+                  f"req/s {early['rps']:.1f} → {late['rps']:.1f}")
+            if early['p99'] and late['p99'] > early['p99'] * 1.2:
+                print(f"   ⚠️  Tail latency grew {(late['p99'] / early['p99'] - 1) * 100:.0f}% over the run")
+            if late['error_rate'] > early['error_rate'] + 0.01:
+                print(f"   ⚠️  Error rate crept up over the run")
+    
+    if stats.cohorts:
+        print(f"\n📶 NETWORK COHORTS (hold = document connection busy, connect to last byte):")
+        print(f"   {'Cohort':12} {'Bots':>7} {'Errors':>7} {'Avg':>8} {'P50':>8} {'P99':>8} {'Hold P50':>9} {'Hold P99':>9}")
+        for name, cohort in stats.cohorts.items():
+            cohort_histogram = cohort['histogram']
+            hold = cohort['hold_histogram']
+            print(f"   {name[:12]:12} {cohort_histogram.count:7} {cohort['errors']:7} {cohort_histogram.mean:7.3f}s "
+                  f"{cohort_histogram.percentile(50):7.3f}s {cohort_histogram.percentile(99):7.3f}s "
+                  f"{hold.percentile(50):8.3f}s {hold.percentile(99):8.3f}s")
+    
+    client = stats.client
+    if client:
+        print(f"\n🖥️  LOAD GENERATOR:")
+        print(f"   Peak RSS: {client['peak_rss_mb']:.0f}MB  Peak CPU: {client['peak_cpu_percent']:.0f}%")
+        if client['throttle_count']:
+            print(f"   Throttled {client['throttle_count']} times for {client['throttled_time']:.1f}s")
+            for offset, duration, reason in client['events'][:5]:
+                print(f"     at +{offset:.1f}s for {duration:.1f}s ({reason})")
+        if client['throttle_count'] or client['peak_cpu_percent'] > 90:
+            print(f"   ⚠️  The client, not the server, was a bottleneck; treat latencies with care")
+    
+    crashes = stats.crashes
+    if crashes:
+        print(f"\n💥 BROWSER CRASHES (load generator side, not target errors):")
+        print(f"   Crashes: {crashes['crashes']}  Relaunches: {crashes['restarts']}  "
+              f"Downtime: {crashes['downtime']:.1f}s")
+        print(f"   Requeued bots: {crashes['requeued']}  Lost in discarded attempts: {crashes['lost_time']:.1f}s")
+        if crashes['abandoned']:
+            print(f"   Out of retries: {crashes['abandoned']} bots (counted as '{ERROR_TYPES['browser_crash']}')")
+        for offset, downtime, reason in crashes['events'][:5]:
+            print(f"     at +{offset:.1f}s for {downtime:.1f}s ({reason})")
+    
+    if stats.resource_index.entries:
+        print_resource_index(stats.resource_index)
+    
+    if stats.pattern_histograms:
+        print_target_breakdown(stats)
+    
+    if stats.error_counts:
+        print_error_breakdown(stats)
     
     print(f"\n📈 STATUS DISTRIBUTION:")
-    for status, count in sorted(status_codes.items(), key=lambda x: str(x[0])):
+    for status, count in sorted(stats.status_codes.items(), key=lambda x: str(x[0])):
         percentage = (count/num_bots) * 100
         bar_length = int(percentage / 2.5)  # Scale to 40 chars max
         bar = '█' * bar_length
         print(f"   {str(status):12} {count:4} ({percentage:5.1f}%) {bar}")
     
     print(f"\n{'='*70}")
+
+async def simulate_concurrent_requests(url, num_bots=100, *, workers=1, options=None, **overrides):
+    """Simulate multiple bots hitting a site concurrently using Playwright or the raw HTTP engine
+
+    options is a RunOptions (see its DEFAULTS for every setting); it is validated and
+    normalized here (scenario steps, URL mix files, cohorts) before the run starts.
+    Any other keyword (max_concurrent=..., engine=..., as before RunOptions) overrides
+    that field of options.
+    With workers > 1 the bots are sharded across that many processes, each with its own
+    event loop and browser/client, and the merged results are reported as one run.
+    Latency statistics come from a streaming histogram; set keep_results=False to
+    skip retaining the per-bot result dicts on long runs.
+    With an arrival_profile num_bots is taken from the profile (open model); with a
+    duration the run is a soak that ignores num_bots and keeps no per-bot results.
+    The har engine records har_file from url first if it does not exist yet.
+    results_file stores every result in a compact ResultStore so
+    `python bots.py report <file>` can reprint the run and `python bots.py join-log`
+    can match it against the target's access log.
+    """
+    options = (options or RunOptions()).replace(**overrides).normalized()
+    if options.engine == 'har' and not os.path.exists(options.har_file):
+        print(f"🎞️  Recording {url} into {options.har_file}...")
+        await record_har(url, options.har_file, options.headless)
+    if options.duration:
+        # Memory must not grow with the length of a soak
+        options = options.replace(keep_results=False)
+        num_bots = None
+    elif options.arrival_profile:
+        num_bots = profile_request_count(options.arrival_profile)
+    if not options.run_id:
+        options = options.replace(run_id=new_run_id())
+    
+    config = run_config(url, num_bots, options, workers=workers)
+    print_config(config)
+    
+    if options.duration:
+        print(f"🚀 Soaking with {options.max_concurrent} virtual users for {options.duration:g}s...")
+    else:
+        print(f"🚀 Launching {num_bots} concurrent requests...")
+    print("-" * 70)
+    
+    results_file = options.results_file
+    if results_file:
+        # The run's own file holds config/summary metadata; rows go to it or to worker parts.
+        # A previous run in the same files is replaced, not mixed in.
+        store = ResultStore(results_file, overwrite=True)
+        store.write_meta(config=config)
+        if workers > 1:
+            store.write_meta(parts=[os.path.basename(worker_part_path(results_file, i)) for i in range(1, workers + 1)])
+            for i in range(1, workers + 1):
+                ResultStore(worker_part_path(results_file, i), overwrite=True).close()
+        store.close()
+    
+    if workers > 1:
+        results, stats, total_time = await asyncio.get_running_loop().run_in_executor(
+            None, run_sharded, url, num_bots, workers, options)
+    else:
+        progress_tracker = ProgressTracker(num_bots)
+        stats = RunStats()
+        start_time = end_time = None
+        
+        async def start_clock():
+            # After the browser launch and pool warm-up, on the same baseline as warmup_time
+            nonlocal start_time
+            start_time = time.time()
+        
+        async def stop_clock():
+            nonlocal end_time
+            end_time = time.time()
+        
+        bot_ids = range(1, sys.maxsize) if options.duration else range(1, num_bots + 1)
+        results = await run_bots(url, bot_ids, progress_tracker=progress_tracker,
+                                 stats=stats, options=options, on_ready=start_clock, on_done=stop_clock)
+        total_time = end_time - start_time
+    
+    if results_file:
+        store = ResultStore(results_file)
+        store.write_meta(total_time=total_time, stats=stats.to_dict())
+        store.close()
+    
+    print("-" * 70)
+    print(f"✓ All requests completed!\n")
+    
+    if not stats.total:
+        print("No results to analyze!")
+        return results
+    
+    print_summary(stats, total_time)
     
     return results
 
+def run_config(url, num_bots, options, **extra):
+    """The configuration a run prints and stores with its results: RunOptions plus run facts
+
+    The URL mix is stored as its size only, and a replayed HAR as its request count (read
+    here, so report works once the file is gone); extra adds runner facts such as workers or agents.
+    """
+    config = dict(options.to_dict(), started=datetime.now().strftime('%Y-%m-%d %H:%M:%S'), url=url,
+                  num_bots=num_bots, **extra)
+    config['pool_reset'] = list(options.pool_reset)
+    config['url_mix_size'] = len(options.url_mix) if options.url_mix else None
+    del config['url_mix']
+    # A coordinator may not have the HAR its agents replay
+    if options.engine == 'har' and options.har_file and os.path.exists(options.har_file):
+        config['har_requests'] = len(load_har_plan(options.har_file, third_party=options.har_third_party))
+    return config
+
+def print_config(config):
+    """Print the load test configuration banner"""
+    print(f"\n{'='*70}")
+    print(f"🔬 PLAYWRIGHT LOAD TEST CONFIGURATION")
+    print(f"{'='*70}")
+    print(f"📅 Started: {config['started']}")
+    print(f"🎯 Target URL: {config['url']}")
+    if config.get('url_mix_size'):
+        print(f"🔀 URL mix: {config['url_mix_size']} weighted URLs")
+    if config.get('duration'):
+        print(f"⏳ Soak: {config['max_concurrent']} virtual users for {config['duration']:g}s")
+    else:
+        print(f"🤖 Number of bots: {config['num_bots']}")
+    print(f"⚙️  Engine: {config['engine']}")
+    if config['engine'] == 'browser':
+        print(f"🔧 Max concurrent browsers: {config['max_concurrent']}")
+        print(f"👁️  Headless mode: {config['headless']}")
+        if config.get('browsers', 1) > 1:
+            print(f"🌐 Browser instances: {config['browsers']} ({config['browser_strategy']})")
+        if config['context_pool']:
+            print(f"♻️  Context pool: {config['max_concurrent']} warm contexts "
+                  f"(reset: {', '.join(config['pool_reset']) or 'none'})")
+        if config.get('page_settle'):
+            print(f"⏱️  Page settle: up to {config['page_settle']:g}s for load/network idle before timings are read")
+    else:
+        print(f"🔧 Max concurrent connections: {config['max_concurrent']}")
+        if config['engine'] == 'har':
+            count = f"{config['har_requests']} requests per page, " if config.get('har_requests') else ''
+            scope = 'all origins' if config.get('har_third_party') else 'page origin only'
+            print(f"🎞️  HAR replay: {config['har_file']} ({count}{scope})")
+    if config['workers'] > 1:
+        print(f"🧩 Worker processes: {config['workers']}")
+    if config.get('agents'):
+        print(f"🛰️  Agents: {config['agents']}")
+    if config['metrics_file'] or config['metrics_port']:
+        print(f"📡 Live metrics: {config['metrics_file'] or '-'} (JSONL), port {config['metrics_port'] or '-'} (Prometheus)")
+    if config['results_file']:
+        print(f"💾 Results file: {config['results_file']}")
+    if config.get('max_client_rss_mb') or config.get('max_client_cpu'):
+        print(f"🛡️  Client limits: RSS {config['max_client_rss_mb'] or '-'}MB, CPU {config['max_client_cpu'] or '-'}%")
+    if config.get('warmup_requests') or config.get('warmup_seconds'):
+        print(f"🔥 Warm-up: first {config.get('warmup_requests') or 0} requests / {config.get('warmup_seconds') or 0:g}s reported separately")
+    if config.get('request_id_header'):
+        print(f"🏷️  Request IDs: {config['request_id_header']}: {request_id(config['run_id'], '<bot id>')}")
+    if config.get('network_cohorts'):
+        total_weight = sum(cohort['weight'] for cohort in config['network_cohorts'])
+        print(f"📶 Network cohorts: " + ', '.join(f"{cohort['name']} {cohort['weight'] / total_weight * 100:.0f}%"
+                                                  for cohort in config['network_cohorts']))
+    if config.get('scenario'):
+        print(f"🧭 Scenario: {len(config['scenario'])} steps ({' → '.join(step['name'] for step in config['scenario'])[:60]})")
+    if config['arrival_profile']:
+        duration = sum(stage[0] for stage in config['arrival_profile'])
+        peak = max(max(stage[1], stage[2]) for stage in config['arrival_profile'])
+        print(f"📈 Arrival profile: {config['num_bots']} requests over {duration:.0f}s (peak {peak:g} req/s)")
+    print(f"{'='*70}\n")
+
+def print_vitals(stats):
+    """Print Core Web Vitals percentiles and LCP per backend TTFB band"""
+    print(f"\n🎨 CORE WEB VITALS (P75 is the field standard; Good = share within the web.dev threshold):")
+    print(f"   {'Metric':11} {'Samples':>7} {'P50':>9} {'P75':>9} {'P90':>9} {'P99':>9} {'Good':>6}")
+    for name, (label, unit, threshold) in VITALS.items():
+        histogram = stats.vitals_histograms.get(name)
+        if not histogram or not histogram.count:
+            continue
+        digits = 3 if unit == 's' or name == 'cls' else 1
+        values = ' '.join(f"{histogram.percentile(percent):{9 - len(unit)}.{digits}f}{unit}" for percent in (50, 75, 90, 99))
+        good = f"{histogram.fraction_at_most(threshold) * 100:5.1f}%" if threshold is not None else f"{'-':>6}"
+        print(f"   {label:11} {histogram.count:7} {values} {good}")
+    
+    if len(stats.lcp_by_ttfb) > 1:
+        print(f"\n   LCP by backend TTFB:")
+        print(f"   {'TTFB':11} {'Samples':>7} {'LCP P50':>9} {'LCP P90':>9}")
+        for limit, band in TTFB_BANDS:
+            histogram = stats.lcp_by_ttfb.get(band)
+            if histogram:
+                print(f"   {band:11} {histogram.count:7} {histogram.percentile(50):8.3f}s {histogram.percentile(90):8.3f}s")
+
+def print_resource_index(index, limit=10):
+    """Print the slowest, most failing and heaviest subresources across all bots"""
+    entries = index.entries
+    total_count = sum(entry['count'] for entry in entries.values())
+    total_bytes = sum(entry['bytes'] for entry in entries.values())
+    cached = sum(entry['cached'] for entry in entries.values())
+    print(f"\n📦 SUBRESOURCES ({len(entries)} distinct, {total_count} fetched, "
+          f"{total_bytes / 1048576:.1f}MB transferred, {cached / total_count * 100 if total_count else 0:.1f}% from cache):")
+    
+    print(f"   Slowest by P90:")
+    print(f"   {'Resource':40} {'Type':>7} {'Count':>6} {'P50':>8} {'P90':>8} {'P99':>8} {'Avg KB':>7}")
+    timed = [item for item in entries.items() if item[1]['histogram'].count]
+    for key, entry in sorted(timed, key=lambda item: -item[1]['histogram'].percentile(90))[:limit]:
+        histogram = entry['histogram']
+        print(f"   {key[-40:]:40} {entry['type'][:7]:>7} {entry['count']:6} {histogram.percentile(50):7.3f}s "
+              f"{histogram.percentile(90):7.3f}s {histogram.percentile(99):7.3f}s {entry['bytes'] / entry['count'] / 1024:7.1f}")
+    
+    failing = sorted((item for item in entries.items() if item[1]['failed']), key=lambda item: -item[1]['failed'])
+    if failing:
+        print(f"\n   Most failing:")
+        for key, entry in failing[:5]:
+            statuses = ', '.join(f"{status}×{count}" for status, count in sorted(entry['statuses'].items()) if status >= 400)
+            print(f"   {key[-40:]:40} {entry['failed']}/{entry['count']} failed{' (' + statuses + ')' if statuses else ''}")
+    
+    print(f"\n   Heaviest by total bytes:")
+    for key, entry in sorted(entries.items(), key=lambda item: -item[1]['bytes'])[:5]:
+        print(f"   {key[-40:]:40} {entry['bytes'] / 1048576:8.2f}MB over {entry['count']} fetches")
+
+def print_target_breakdown(stats, limit=15):
+    """Print per-pattern and slowest per-URL latency/error tables of a mixed-target run"""
+    print(f"\n🔗 PER ENDPOINT PATTERN ({len(stats.pattern_histograms)} patterns, {len(stats.url_stats)} URLs, slowest P99 first):")
+    print(f"   {'Pattern':34} {'Requests':>8} {'Errors':>7} {'Avg':>8} {'P50':>8} {'P99':>8}")
+    patterns = sorted(stats.pattern_histograms.items(), key=lambda item: -item[1].percentile(99))
+    for pattern, histogram in patterns[:limit]:
+        errors = stats.pattern_errors.get(pattern, 0)
+        print(f"   {pattern[-34:]:34} {histogram.count:8} {errors / histogram.count * 100:6.1f}% "
+              f"{histogram.mean:7.3f}s {histogram.percentile(50):7.3f}s {histogram.percentile(99):7.3f}s")
+    if len(patterns) > limit:
+        print(f"   ... and {len(patterns) - limit} more patterns")
+    
+    # Per-URL samples are thin in big mixes, so rank by mean and show the sample size
+    urls = sorted(stats.url_stats.items(), key=lambda item: -item[1][2] / item[1][0])
+    print(f"\n🐢 SLOWEST URLS (by average):")
+    print(f"   {'URL':44} {'Requests':>8} {'Errors':>7} {'Avg':>8} {'Max':>8}")
+    for url, (count, errors, total, max_latency) in urls[:10]:
+        print(f"   {url[-44:]:44} {count:8} {errors:7} {total / count:7.3f}s {max_latency:7.3f}s")
+    failing = sorted((item for item in stats.url_stats.items() if item[1][1]), key=lambda item: -item[1][1])
+    if failing:
+        print(f"\n   Most failing URLs:")
+        for url, (count, errors, total, max_latency) in failing[:5]:
+            print(f"   {url[-44:]:44} {errors}/{count} failed")
+
+def print_error_breakdown(stats):
+    """Print failures by error type with latency to failure and a few raw messages"""
+    failed = sum(stats.error_counts.values())
+    order = list(ERROR_TYPES)
+    print(f"\n❌ ERRORS BY TYPE:")
+    print(f"   {'Type':28} {'Count':>7} {'Share':>6} {'Avg':>8} {'P50':>8} {'P99':>8}")
+    for category, count in sorted(stats.error_counts.items(),
+                                  key=lambda item: (order.index(item[0]) if item[0] in order else len(order), item[0])):
+        histogram = stats.error_histograms.get(category)
+        timing = (f"{histogram.mean:7.3f}s {histogram.percentile(50):7.3f}s {histogram.percentile(99):7.3f}s"
+                  if histogram and histogram.count else f"{'-':>8} {'-':>8} {'-':>8}")
+        print(f"   {ERROR_TYPES.get(category, category)[:28]:28} {count:7} {count / failed * 100:5.1f}% {timing}")
+        for sample in stats.error_samples.get(category, [])[:2]:
+            print(f"     e.g. {sample[:90]}")
+
+def report(results_file):
+    """Regenerate the full summary of a stored run without re-running it"""
+    store = ResultStore.load(results_file)
+    if 'config' in store.meta:
+        print_config(store.meta['config'])
+    if not len(store):
+        print("No results to analyze!")
+        return
+    
+    total_time = store.meta.get('total_time') or store.span()
+    print_summary(store.build_stats(), total_time)
+
+async def compare_cache(url, num_bots=50, max_concurrent=10, headless=True, verbose=False, settle=10.0):
+    """Load the page twice per virtual user on one persistent context: cold cache, then warm
+
+    Each bot gets its own context (an empty HTTP cache) and navigates to url, then
+    navigates again on the same context with cookies and cache kept, so the second
+    load shows what returning visitors get from the browser cache. Each load settles
+    for up to settle seconds (see settle_page) so late assets show up in the resource
+    index. Returns the (cold, warm) RunStats and prints them side by side.
+    """
+    from playwright.async_api import async_playwright
+    
+    print(f"\n{'='*70}")
+    print(f"🧊 COLD vs WARM BROWSER CACHE")
+    print(f"{'='*70}")
+    print(f"🎯 Target URL: {url}")
+    print(f"🤖 Virtual users: {num_bots} ({max_concurrent} at a time), 2 loads each")
+    print(f"{'='*70}\n")
+    
+    semaphore = asyncio.Semaphore(max_concurrent)
+    progress_tracker = ProgressTracker(num_bots * 2)
+    cold, warm = RunStats(), RunStats()
+    
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        try:
+            async def virtual_user(bot_id):
+                async with semaphore:
+                    # A one-slot pool that keeps everything between loads is a persistent context
+                    pool = ContextPool(browser, 1, reset=())
+                    await pool.start()
+                    try:
+                        for stats in (cold, warm):
+                            stats.record(await send_request(browser, url, bot_id, progress_tracker, verbose,
+                                                            context_pool=pool, settle=settle))
+                    finally:
+                        await pool.close()
+            
+            await asyncio.gather(*(virtual_user(bot_id) for bot_id in range(1, num_bots + 1)))
+        finally:
+            await browser.close()
+    
+    print(f"\n{'='*70}")
+    print(f"📊 CACHE COMPARISON")
+    print(f"{'='*70}")
+    print(f"   {'':12} {'Cold':>10} {'Warm':>10} {'Change':>9}")
+    rows = [('Success', lambda s: s.successful / s.total * 100 if s.total else 0.0, '%')]
+    for label, percent in (('Average', None), ('P50', 50), ('P90', 90), ('P99', 99)):
+        rows.append((label, lambda s, percent=percent: s.histogram.mean if percent is None else s.histogram.percentile(percent), 's'))
+    for phase in TIMING_PHASES:
+        if phase in cold.phase_histograms and phase in warm.phase_histograms:
+            rows.append((f"{phase} P50", lambda s, phase=phase: s.phase_histograms[phase].percentile(50), 's'))
+    for label, value, unit in rows:
+        cold_value, warm_value = value(cold), value(warm)
+        change = f"{(warm_value - cold_value) / cold_value * 100:+.0f}%" if cold_value and unit == 's' else ''
+        if unit == '%':
+            print(f"   {label:12} {cold_value:9.1f}% {warm_value:9.1f}% {change:>9}")
+        else:
+            print(f"   {label:12} {cold_value:9.3f}s {warm_value:9.3f}s {change:>9}")
+    print(f"{'='*70}\n")
+    return cold, warm
+
+async def find_capacity(url, mode='concurrency', start=10, growth=1.5, max_level=5000, slo_percentile=99,
+                        slo_latency=1.0, max_error_rate=0.01, bots_per_slot=5, stage_duration=30, options=None,
+                        **overrides):
+    """Step load up until the latency SLO or error budget breaks and report the knee
+
+    mode='concurrency' runs bots_per_slot * level bots behind max_concurrent=level per
+    stage (closed model); mode='rate' holds a constant arrival rate of level req/s for
+    stage_duration seconds (open model). Each stage multiplies level by growth. The knee
+    is the passing stage with the best throughput per second of tail latency.
+    options is the RunOptions every stage starts from (max_concurrent 1000 when None,
+    which caps the requests in flight in rate mode); any other keyword overrides a field of it.
+    """
+    options = (options or RunOptions(max_concurrent=1000)).replace(**overrides).normalized()
+    if mode not in ('concurrency', 'rate'):
+        raise ValueError(f"Unknown capacity mode: {mode!r} (expected 'concurrency' or 'rate')")
+    unit = 'concurrent' if mode == 'concurrency' else 'req/s'
+    
+    print(f"\n{'='*70}")
+    print(f"🧗 CAPACITY SEARCH")
+    print(f"{'='*70}")
+    print(f"🎯 Target URL: {url}")
+    print(f"📐 Mode: {mode} from {start:g} {unit}, x{growth:g} per stage (max {max_level:g})")
+    print(f"🚦 SLO: P{slo_percentile:g} <= {slo_latency:.3f}s, error rate <= {max_error_rate*100:.2f}%")
+    print(f"{'='*70}\n")
+    
+    stages = []
+    level = start
+    while level <= max_level:
+        stage_options = options.replace(keep_results=False)
+        if mode == 'concurrency':
+            stage_options = stage_options.replace(max_concurrent=int(level))
+            bot_ids = range(1, int(level) * bots_per_slot + 1)
+        else:
+            stage_options = stage_options.replace(arrival_profile=constant_profile(level, stage_duration))
+            bot_ids = range(1, profile_request_count(stage_options.arrival_profile) + 1)
+        
+        print(f"▶️  Stage {len(stages) + 1}: {level:g} {unit}")
+        stats = RunStats()
+        start_time = end_time = None
+        
+        async def start_clock():
+            nonlocal start_time
+            start_time = time.time()
+        
+        async def stop_clock():
+            # Before the teardown of pools and browsers, which is no part of the stage
+            nonlocal end_time
+            end_time = time.time()
+        
+        await run_bots(url, bot_ids, progress_tracker=ProgressTracker(len(bot_ids), label=f"{level:g} {unit}"),
+                       stats=stats, options=stage_options, on_ready=start_clock, on_done=stop_clock)
+        duration = end_time - start_time
+        
+        stage = {
+            'level': level,
+            'throughput': stats.total / duration if duration else 0.0,
+            'p95': stats.histogram.percentile(95),
+            'p99': stats.histogram.percentile(99),
+            'slo_value': stats.histogram.percentile(slo_percentile),
+            'error_rate': 1 - stats.successful / stats.total if stats.total else 1.0,
+        }
+        stage['passed'] = stage['slo_value'] <= slo_latency and stage['error_rate'] <= max_error_rate
+        stages.append(stage)
+        if not stage['passed']:
+            break
+        level = max(level + 1, round(level * growth))
+    
+    passing = [stage for stage in stages if stage['passed']]
+    knee = max(passing, key=lambda s: s['throughput'] / s['slo_value'] if s['slo_value'] else 0.0, default=None)
+    
+    print(f"\n{'='*70}")
+    print(f"📊 CAPACITY RESULTS")
+    print(f"{'='*70}")
+    print(f"   {'Level':>10} {'Throughput':>12} {'P95':>8} {'P99':>8} {'Errors':>8}")
+    for stage in stages:
+        marker = ' ⭐ knee' if stage is knee else ('' if stage['passed'] else ' ❌ breach')
+        print(f"   {stage['level']:10g} {stage['throughput']:10.2f}/s {stage['p95']:7.3f}s {stage['p99']:7.3f}s "
+              f"{stage['error_rate']*100:7.2f}%{marker}")
+    print()
+    if stages[-1]['passed']:
+        # Every stage passed: the capacity is somewhere above the last one, not at it
+        print(f"   ⚠️  No breaking point found within the tested range (up to {stages[-1]['level']:g} {unit}, "
+              f"max level {max_level:g}); the capacity is higher, raise max_level to find it")
+        print(f"   ⭐ Knee so far: {knee['level']:g} {unit} "
+              f"({knee['throughput']:.2f} req/s, P{slo_percentile:g} {knee['slo_value']:.3f}s)")
+    elif passing:
+        best = passing[-1]
+        print(f"   ✅ Highest passing level: {best['level']:g} {unit} ({best['throughput']:.2f} req/s)")
+        print(f"   ⭐ Knee: {knee['level']:g} {unit} ({knee['throughput']:.2f} req/s, "
+              f"P{slo_percentile:g} {knee['slo_value']:.3f}s)")
+    else:
+        print(f"   ❌ SLO breached at the first stage ({start:g} {unit}); lower the start level")
+    print(f"{'='*70}\n")
+    return stages
+
+MESSAGE_LIMIT = 64 * 1024 * 1024  # Stats messages carry whole histograms
+
+async def send_message(writer, message):
+    """Send one newline-delimited JSON message of the coordinator/agent protocol"""
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+
+async def read_message(reader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Peer closed the connection")
+    return json.loads(line)
+
+async def run_coordinator(url, num_bots, agents, host='0.0.0.0', port=7700, start_delay=1.0, options=None,
+                          **overrides):
+    """Spread one load test across agents (python bots.py agent HOST:PORT) and merge their stats
+
+    Protocol, one JSON object per line: agent -> hello; coordinator -> plan (url, bot id
+    range, RunOptions dict); agent sets its engine up -> ready; ping/pong to measure RTT;
+    coordinator -> start with a per-agent delay so every agent starts at the same moment
+    despite clock skew; agent -> result (RunStats dict and its run duration) or error.
+    options is the RunOptions the agents run with; any other keyword overrides a field of it.
+    """
+    # Agents may live on other hosts, so they keep no local files and get the URL mix itself
+    options = (options or RunOptions()).replace(**overrides).normalized().replace(keep_results=False, results_file=None,
+                                                             metrics_file=None)
+    if not options.run_id:
+        options = options.replace(run_id=new_run_id())
+    if options.duration:
+        num_bots = None
+    elif options.arrival_profile:
+        num_bots = profile_request_count(options.arrival_profile)
+    
+    config = run_config(url, num_bots, options, workers=1, agents=agents)
+    print_config(config)
+    
+    connections = []
+    all_connected = asyncio.Event()
+    
+    async def on_connect(reader, writer):
+        hello = await read_message(reader)
+        connections.append((reader, writer))
+        print(f"🔌 Agent {len(connections)}/{agents} connected: {hello['host']} (pid {hello['pid']})")
+        if len(connections) == agents:
+            all_connected.set()
+    
+    server = await asyncio.start_server(on_connect, host, port, limit=MESSAGE_LIMIT)
+    print(f"📡 Waiting for {agents} agents on {host}:{port}...")
+    await all_connected.wait()
+    server.close()
+    
+    shards, shard_options = plan_shards(config['num_bots'], agents, options)
+    connections = connections[:len(shards)]
+    try:
+        for agent_id, ((reader, writer), shard, agent_options) in enumerate(zip(connections, shards, shard_options), 1):
+            await send_message(writer, {'type': 'plan', 'agent_id': agent_id, 'url': url,
+                                        'bot_ids': [shard.start, shard.stop, shard.step],
+                                        'options': agent_options.to_dict()})
+        
+        rtts = []
+        for reader, writer in connections:
+            message = await read_message(reader)
+            if message['type'] != 'ready':
+                raise RuntimeError(f"Agent failed during setup: {message.get('error')}")
+            ping_time = time.time()
+            await send_message(writer, {'type': 'ping'})
+            await read_message(reader)
+            rtts.append(time.time() - ping_time)
+        
+        # Everyone starts start_delay from now, minus the one-way trip of the start message
+        loop = asyncio.get_running_loop()
+        start_at = loop.time() + start_delay
+        for (reader, writer), rtt in zip(connections, rtts):
+            await send_message(writer, {'type': 'start', 'delay': start_at - loop.time() - rtt / 2})
+        print(f"🚀 Start sent (max RTT {max(rtts)*1000:.1f}ms)")
+        print("-" * 70)
+        
+        stats = RunStats()
+        durations = []
+        errors = []
+        for agent_id, message in enumerate(await asyncio.gather(*(read_message(reader) for reader, _ in connections)), 1):
+            if message['type'] == 'result':
+                stats.merge(RunStats.from_dict(message['stats']))
+                durations.append(message['elapsed'])
+            else:
+                errors.append(f"Agent {agent_id}: {message.get('error')}")
+    except BaseException:
+        for _, writer in connections:
+            if not writer.is_closing():
+                try:
+                    await send_message(writer, {'type': 'abort'})
+                except ConnectionError:
+                    pass
+        raise
+    finally:
+        for _, writer in connections:
+            writer.close()
+    
+    print("-" * 70)
+    if errors:
+        raise RuntimeError("Distributed run failed - " + "; ".join(errors))
+    print(f"✓ All {len(durations)} agents reported!\n")
+    
+    if not stats.total:
+        print("No results to analyze!")
+        return stats
+    print_summary(stats, max(durations))
+    return stats
+
+async def run_agent(coordinator):
+    """Join a coordinator at HOST:PORT, run the slice of the test it hands out and report back"""
+    host, _, port = coordinator.rpartition(':')
+    reader, writer = await asyncio.open_connection(host or '127.0.0.1', int(port), limit=MESSAGE_LIMIT)
+    try:
+        await send_message(writer, {'type': 'hello', 'host': socket.gethostname(), 'pid': os.getpid()})
+        plan = await read_message(reader)
+        bot_ids = range(*plan['bot_ids'])
+        options = RunOptions.from_dict(plan['options'])
+        duration = options.duration
+        if duration:
+            print(f"🛰️  Agent {plan['agent_id']}: soaking {plan['url']} for {duration:g}s")
+        else:
+            print(f"🛰️  Agent {plan['agent_id']}: {len(bot_ids)} bots against {plan['url']}")
+        
+        progress_tracker = ProgressTracker(None if duration else len(bot_ids), label=f"Agent {plan['agent_id']}")
+        stats = RunStats()
+        start_time = end_time = None
+        
+        async def wait_for_start():
+            nonlocal start_time
+            await send_message(writer, {'type': 'ready'})
+            while True:
+                message = await read_message(reader)
+                if message['type'] == 'ping':
+                    await send_message(writer, {'type': 'pong'})
+                elif message['type'] == 'start':
+                    await asyncio.sleep(max(0.0, message['delay']))
+                    break
+                else:
+                    raise RuntimeError(f"Coordinator sent {message['type']}")
+            start_time = time.time()
+        
+        async def stop_clock():
+            # Before the engine teardown, which the coordinator's throughput should not include
+            nonlocal end_time
+            end_time = time.time()
+        
+        try:
+            await run_bots(plan['url'], bot_ids, progress_tracker=progress_tracker, stats=stats,
+                           options=options, on_ready=wait_for_start, on_done=stop_clock)
+        except Exception as e:
+            await send_message(writer, {'type': 'error', 'error': f"{type(e).__name__}: {e}"})
+            raise
+        await send_message(writer, {'type': 'result', 'stats': stats.to_dict(), 'elapsed': end_time - start_time})
+        print(f"✓ Agent {plan['agent_id']} done: {stats.total} requests")
+    finally:
+        writer.close()
+
+class TargetServer:
+    """Stand-in target for benchmarking bots.py itself
+
+    Minimal asyncio HTTP/1.1 keep-alive server answering every GET with an HTML page
+    of payload_bytes after latency (+/- jitter) seconds, or a 500 for error_rate of
+    the requests. With access_log, each request is appended to that file in nginx
+    combined format plus rid=<X-Request-ID> rt=<seconds>, for trying out join-log.
+    GET STATS_PATH returns its own counters as JSON (see stats) so a benchmark can
+    tell when the target, not the generator, is the bottleneck.
+    """
+    STATS_PATH = '/__target/stats'
+    LAG_TICK = 0.01  # Seconds between event loop lag samples
+    
+    def __init__(self, latency=0.0, jitter=0.0, payload_bytes=2048, error_rate=0.0, seed=None, access_log=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.access_log = open(access_log, 'a', buffering=1) if access_log else None
+        page = b'<html><head><title>bots.py target</title></head><body>'
+        self.body = page + b'x' * max(0, payload_bytes - len(page) - 14) + b'</body></html>'
+        self.requests = 0
+        self.service_time = 0.0
+        self.loop_lag = 0.0
+        self.lag_samples = 0
+        self.server = None
+        self.port = None
+        self.monitor = None
+        self.handlers = set()
+    
+    def stats(self):
+        """Counters since start: requests served, their summed time from request line to
+        response written (configured latency included), and the summed event loop lag
+        over lag_samples ticks. A saturated target shows up in the last two."""
+        return {'requests': self.requests, 'service_time': self.service_time, 'loop_lag': self.loop_lag,
+                'lag_samples': self.lag_samples}
+    
+    async def _watch_loop(self):
+        # A busy loop wakes sleepers late; requests waiting to be read queue the same way
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.LAG_TICK)
+            self.loop_lag += max(0.0, time.perf_counter() - started - self.LAG_TICK)
+            self.lag_samples += 1
+    
+    async def _handle(self, reader, writer):
+        self.handlers.add(asyncio.current_task())
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                started = time.perf_counter()
+                close = False
+                rid = '-'
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    if line.lower().startswith(b'connection:') and b'close' in line.lower():
+                        close = True
+                    elif line.lower().startswith(b'x-request-id:'):
+                        rid = line.split(b':', 1)[1].strip().decode(errors='replace')
+                if request_line.split(b' ')[1:2] == [self.STATS_PATH.encode()]:
+                    body = json.dumps(self.stats()).encode()
+                    writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: '
+                                 + str(len(body)).encode() + b'\r\n\r\n' + body)
+                    await writer.drain()
+                    continue
+                self.requests += 1
+                
+                delay = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if self.error_rate and self.rng.random() < self.error_rate:
+                    status, body = b'500 Internal Server Error', b'injected error'
+                else:
+                    status, body = b'200 OK', self.body
+                writer.write(b'HTTP/1.1 ' + status + b'\r\nContent-Type: text/html\r\nContent-Length: '
+                             + str(len(body)).encode() + b'\r\n\r\n' + body)
+                await writer.drain()
+                self.service_time += time.perf_counter() - started
+                if self.access_log:
+                    peer = writer.get_extra_info('peername') or ('-',)
+                    stamp = datetime.now(timezone.utc).strftime('%d/%b/%Y:%H:%M:%S +0000')
+                    self.access_log.write(f'{peer[0]} - - [{stamp}] "{request_line.decode(errors="replace").strip()}" '
+                                          f'{status[:3].decode()} {len(body)} "-" "-" '
+                                          f'rid={rid} rt={time.perf_counter() - started:.3f}\n')
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Only close() cancels handlers; ending normally keeps asyncio's stream callback
+            # from logging the cancellation as an unhandled error
+            pass
+        finally:
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+    
+    async def start(self, host='127.0.0.1', port=0):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.monitor = asyncio.create_task(self._watch_loop())
+        return self.port
+    
+    async def close(self):
+        if self.monitor:
+            self.monitor.cancel()
+            try:
+                await self.monitor
+            except asyncio.CancelledError:
+                pass
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        # Keep-alive connections still have a handler waiting for their next request
+        for task in self.handlers:
+            task.cancel()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        self.handlers.clear()
+        if self.access_log:
+            self.access_log.close()
+
+def _serve_target(options, port_queue):
+    async def serve():
+        server = TargetServer(**options)
+        port_queue.put(await server.start())
+        await asyncio.Event().wait()
+    asyncio.run(serve())
+
+def start_target_process(**options):
+    """Run a TargetServer in its own process so it does not share the generator's CPU
+
+    Returns (process, port); terminate the process when done.
+    """
+    ctx = multiprocessing.get_context('spawn')
+    port_queue = ctx.Queue()
+    process = ctx.Process(target=_serve_target, args=(options, port_queue), daemon=True)
+    process.start()
+    return process, port_queue.get(timeout=30)
+
+def write_synthetic_har(har_file, url, assets=5):
+    """HAR of a document followed by assets fetched in parallel, for benchmarking the har engine"""
+    started = datetime.now().astimezone()
+    entries = [{'startedDateTime': started.isoformat(), 'time': 1, 'request': {'method': 'GET', 'url': url}}]
+    for index in range(assets):
+        entries.append({'startedDateTime': (started + timedelta(milliseconds=5)).isoformat(), 'time': 1,
+                        'request': {'method': 'GET', 'url': urljoin(url, f'/asset/{index}')}})
+    with open(har_file, 'w') as f:
+        json.dump({'log': {'entries': entries}}, f)
+
+def benchmark_bookkeeping(samples=100000):
+    """Seconds of per-result bookkeeping (RunStats, MetricsReporter, ResultStore)"""
+    stats = RunStats()
+    reporter = MetricsReporter(stats, ProgressTracker(samples))
+    store = ResultStore()
+    result = {'bot_id': 0, 'status': 200, 'elapsed': 0.05, 'setup_time': 0.001, 'success': True,
+              'title': 'bots.py target', 'url': 'http://127.0.0.1/'}
+    start_time = time.perf_counter()
+    for bot_id in range(samples):
+        result['bot_id'] = bot_id
+        stats.record(result)
+        reporter.record(result)
+        store.record(result)
+    return (time.perf_counter() - start_time) / samples
+
+TARGET_SATURATION_DELAY = 0.001  # Seconds the bench target may add per request past its idle delay
+
+async def run_benchmark(engines=('http', 'har', 'browser'), concurrency_levels=(10, 50, 200), requests=2000,
+                        latency=0.0, payload_bytes=2048, output=None, baseline=None, max_regression=10.0):
+    """Measure the generator's own max throughput and per-request overhead against a local target
+
+    Overhead is mean latency minus the target's configured latency and minus the delay
+    the target itself added (its service time past the configured latency plus its
+    event loop lag, see TargetServer.stats). A run where the target added more than
+    TARGET_SATURATION_DELAY over what it adds to one request at a time (timer slack) is
+    marked saturated: its throughput and overhead measure the target, so no overhead
+    is reported and it is left out of the baseline check.
+    With output the numbers are saved as JSON; with baseline a saved run is compared
+    and every engine/concurrency whose throughput dropped by more than max_regression
+    percent counts as a failure. Returns the number of failures.
+    """
+    process, port = start_target_process(latency=latency, payload_bytes=payload_bytes)
+    url = f'http://127.0.0.1:{port}/'
+    results = {}
+    stats_client = HttpClientPool(max_connections=1)
+    
+    async def target_stats():
+        _, _, body, _ = await stats_client.request(urljoin(url, TargetServer.STATS_PATH))
+        return json.loads(body)
+    
+    def target_delay(before, after):
+        served = max(1, after['requests'] - before['requests'])
+        service = max(0.0, (after['service_time'] - before['service_time']) / served - latency)
+        return service + (after['loop_lag'] - before['loop_lag']) / max(1, after['lag_samples'] - before['lag_samples'])
+    
+    print(f"\n{'='*70}")
+    print(f"🏎️  TOOL OVERHEAD BENCHMARK")
+    print(f"{'='*70}")
+    print(f"🎯 Local target: {url} (latency {latency*1000:.0f}ms, payload {payload_bytes}B)")
+    print(f"🤖 Requests per run: {requests}")
+    print(f"{'='*70}\n")
+    
+    try:
+        before = await target_stats()
+        for _ in range(20):
+            await stats_client.request(url)
+        idle_delay = target_delay(before, await target_stats())
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            har_file = os.path.join(tmp, 'bench.har')
+            write_synthetic_har(har_file, url)
+            
+            for engine in engines:
+                if engine == 'browser' and importlib.util.find_spec('playwright') is None:
+                    print(f"⏭️  Skipping browser engine (pip install playwright)")
+                    continue
+                for concurrency in concurrency_levels:
+                    stats = RunStats()
+                    start_time = end_time = None
+                    
+                    async def start_clock():
+                        nonlocal start_time
+                        start_time = time.time()
+                    
+                    async def stop_clock():
+                        # Pool and browser teardown is not part of the measured throughput
+                        nonlocal end_time
+                        end_time = time.time()
+                    
+                    # No page settle: the bench measures the request path, not how long pages take to go idle
+                    options = RunOptions(max_concurrent=concurrency, engine=engine, har_file=har_file,
+                                         context_pool=engine == 'browser', keep_results=False, metrics_interval=5.0,
+                                         page_settle=0)
+                    before = await target_stats()
+                    await run_bots(url, range(1, requests + 1),
+                                   progress_tracker=ProgressTracker(requests, label=f"{engine} x{concurrency}"),
+                                   stats=stats, options=options, on_ready=start_clock, on_done=stop_clock)
+                    duration = end_time - start_time
+                    delay = target_delay(before, await target_stats())
+                    saturated = delay > idle_delay + TARGET_SATURATION_DELAY
+                    results[f"{engine}@{concurrency}"] = {
+                        'engine': engine,
+                        'concurrency': concurrency,
+                        'throughput': stats.total / duration,
+                        'mean': stats.histogram.mean,
+                        'p99': stats.histogram.percentile(99),
+                        'overhead': None if saturated else max(0.0, stats.histogram.mean - latency - delay),
+                        'target_delay': delay,
+                        'saturated': saturated,
+                        'setup': stats.setup_histogram.mean,
+                        'errors': stats.total - stats.successful,
+                    }
+    finally:
+        await stats_client.close()
+        process.terminate()
+        process.join()
+    
+    bookkeeping = benchmark_bookkeeping()
+    
+    print(f"\n{'='*70}")
+    print(f"📊 BENCHMARK RESULTS")
+    print(f"{'='*70}")
+    print(f"   {'Engine':8} {'Conc':>5} {'Throughput':>12} {'Mean':>8} {'P99':>8} {'Overhead':>9} {'Target':>8} "
+          f"{'Setup':>8} {'Errors':>6}")
+    for key, row in results.items():
+        overhead = f"{'saturated':>9}" if row['saturated'] else f"{row['overhead']*1000:7.2f}ms"
+        print(f"   {row['engine']:8} {row['concurrency']:5} {row['throughput']:10.1f}/s {row['mean']*1000:6.2f}ms "
+              f"{row['p99']*1000:6.2f}ms {overhead} {row['target_delay']*1000:6.2f}ms {row['setup']*1000:6.2f}ms "
+              f"{row['errors']:6}")
+    saturated = [key for key, row in results.items() if row['saturated']]
+    if saturated:
+        print(f"\n   ⚠️  Target saturated in {', '.join(saturated)}: it added {TARGET_SATURATION_DELAY*1000:g}ms+ "
+              f"per request over its idle delay ({idle_delay*1000:.2f}ms), so those rows measure the target,")
+        print(f"       not bots.py (lower the concurrency or raise the latency)")
+    print(f"\n   Bookkeeping per result: {bookkeeping*1e6:.1f}µs (RunStats + MetricsReporter + ResultStore)")
+    
+    failures = []
+    if baseline:
+        with open(baseline) as f:
+            previous = json.load(f)['results']
+        for key, row in results.items():
+            if row['saturated'] or previous.get(key, {}).get('saturated'):
+                continue
+            if key in previous and previous[key]['throughput']:
+                change = (row['throughput'] - previous[key]['throughput']) / previous[key]['throughput'] * 100
+                if change < -max_regression:
+                    failures.append(f"{key} throughput {change:+.1f}%")
+        if failures:
+            print(f"\n❌ REGRESSIONS vs {baseline}:")
+            for failure in failures:
+                print(f"   - {failure}")
+        else:
+            print(f"\n✅ No throughput regressions vs {baseline}")
+    
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'results': results, 'bookkeeping': bookkeeping, 'latency': latency, 'target_idle_delay': idle_delay,
+                       'payload_bytes': payload_bytes, 'requests': requests}, f, indent=2)
+        print(f"\n💾 Saved to {output}")
+    print(f"{'='*70}\n")
+    return len(failures)
+
+def sample_percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(len(sorted_values) * percent / 100))
+    return sorted_values[rank - 1]
+
+def mann_whitney_p(a, b):
+    """Two-sided p-value of the Mann-Whitney U rank test (normal approximation, tie corrected)"""
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 1.0
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    rank_sum_a = 0.0
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        average_rank = (i + j) / 2 + 1
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        rank_sum_a += average_rank * sum(1 for k in range(i, j + 1) if combined[k][1] == 0)
+        i = j + 1
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))) if n > 1 else 0.0
+    if not sigma:
+        return 1.0
+    z = (u - n1 * n2 / 2) / sigma
+    return math.erfc(abs(z) / math.sqrt(2))
+
+def bootstrap_delta_ci(baseline, current, percent, iterations=200, confidence=0.95, max_samples=5000, rng=None):
+    """Bootstrap confidence interval for current minus baseline at the given percentile"""
+    rng = rng or random.Random(0)
+    baseline = baseline if len(baseline) <= max_samples else rng.sample(baseline, max_samples)
+    current = current if len(current) <= max_samples else rng.sample(current, max_samples)
+    deltas = sorted(
+        sample_percentile(sorted(rng.choices(current, k=len(current))), percent)
+        - sample_percentile(sorted(rng.choices(baseline, k=len(baseline))), percent)
+        for _ in range(iterations)
+    )
+    tail = (1 - confidence) / 2 * 100
+    return sample_percentile(deltas, tail), sample_percentile(deltas, 100 - tail)
+
+def compare_runs(baseline_file, current_file, slos=None, max_regression=10.0, max_error_rate=None, confidence=0.95):
+    """Compare a stored run against a baseline and return the number of gate failures
+
+    A latency percentile counts as a regression when it grew by more than max_regression
+    percent and its bootstrap confidence interval excludes zero; throughput fails when it
+    dropped by more than max_regression percent. slos maps percentile -> seconds the
+    current run must stay under, max_error_rate caps its failure fraction.
+    Warm-up rows are left out and throughput is taken over the post-warm-up time,
+    as in the run's own summary.
+    """
+    runs = []
+    for path in (baseline_file, current_file):
+        store = ResultStore.load(path)
+        steady = [row for row, flags in enumerate(store.columns['flags']) if not flags & ResultStore.WARMUP]
+        if not steady:
+            raise ValueError(f"{path} has no results past the warm-up")
+        total_time = store.meta.get('total_time') or store.span()
+        if len(steady) < len(store):
+            total_time -= store.meta.get('stats', {}).get('warmup_time', 0.0)
+        latencies, success = store.columns['latency'], store.columns['success']
+        runs.append({
+            'latencies': sorted(latencies[row] for row in steady),
+            'throughput': len(steady) / max(total_time, 1e-9),
+            'error_rate': 1 - sum(success[row] for row in steady) / len(steady),
+        })
+    baseline, current = runs
+    failures = []
+    
+    def change(old, new):
+        return (new - old) / old * 100 if old else 0.0
+    
+    print(f"\n{'='*70}")
+    print(f"⚖️  RUN COMPARISON")
+    print(f"{'='*70}")
+    print(f"   Baseline: {baseline_file} ({len(baseline['latencies'])} requests)")
+    print(f"   Current:  {current_file} ({len(current['latencies'])} requests)")
+    print(f"\n   {'Metric':12} {'Baseline':>10} {'Current':>10} {'Change':>9}   {int(confidence*100)}% CI of delta")
+    
+    throughput_change = change(baseline['throughput'], current['throughput'])
+    flag = ''
+    if throughput_change < -max_regression:
+        flag = ' ❌'
+        failures.append(f"throughput dropped {-throughput_change:.1f}%")
+    print(f"   {'Throughput':12} {baseline['throughput']:9.2f}/s {current['throughput']:9.2f}/s {throughput_change:+8.1f}%{flag}")
+    
+    rng = random.Random(0)
+    for percent in (50, 90, 95, 99):
+        old = sample_percentile(baseline['latencies'], percent)
+        new = sample_percentile(current['latencies'], percent)
+        low, high = bootstrap_delta_ci(baseline['latencies'], current['latencies'], percent,
+                                       confidence=confidence, rng=rng)
+        flag = ''
+        if change(old, new) > max_regression and low > 0:
+            flag = ' ❌'
+            failures.append(f"P{percent} regressed {change(old, new):.1f}% ({old:.3f}s -> {new:.3f}s)")
+        print(f"   {f'P{percent}':12} {old:9.3f}s {new:9.3f}s {change(old, new):+8.1f}%   "
+              f"[{low:+.3f}s, {high:+.3f}s]{flag}")
+    
+    print(f"   {'Error rate':12} {baseline['error_rate']*100:9.2f}% {current['error_rate']*100:9.2f}%")
+    
+    p_value = mann_whitney_p(baseline['latencies'], current['latencies'])
+    verdict = 'significant' if p_value < 1 - confidence else 'not significant'
+    print(f"\n   Mann-Whitney U: p = {p_value:.4f} ({verdict} at {int(confidence*100)}%)")
+    
+    # Absolute gates on the current run
+    if max_error_rate is not None and current['error_rate'] > max_error_rate:
+        failures.append(f"error rate {current['error_rate']*100:.2f}% above {max_error_rate*100:.2f}%")
+    for percent, limit in (slos or {}).items():
+        value = sample_percentile(current['latencies'], percent)
+        if value > limit:
+            failures.append(f"P{percent:g} {value:.3f}s above SLO {limit:.3f}s")
+    
+    if failures:
+        print(f"\n❌ GATE FAILED:")
+        for failure in failures:
+            print(f"   - {failure}")
+    else:
+        print(f"\n✅ GATE PASSED")
+    print(f"{'='*70}\n")
+    return len(failures)
+
+def parse_slo(text):
+    """Parse a 'p99=0.8' style SLO into (99.0, 0.8)"""
+    name, _, limit = text.partition('=')
+    if not name.lower().startswith('p') or not limit:
+        raise argparse.ArgumentTypeError(f"SLO must look like p99=0.8, got {text!r}")
+    return float(name[1:]), float(limit)
+
+# Duration fields tried, in order, on JSON access log lines: name -> seconds per unit
+LOG_TIME_FIELDS = {
+    'request_time': 1.0, 'upstream_response_time': 1.0, 'duration_ms': 1e-3, 'elapsed_ms': 1e-3,
+    'response_time_ms': 1e-3, 'latency_ms': 1e-3, 'duration': 1.0, 'elapsed': 1.0, 'response_time': 1.0,
+}
+TIME_UNITS = {'s': 1.0, 'ms': 1e-3, 'us': 1e-6}
+LOG_STATUS_RE = re.compile(r'" (\d{3}) ')
+LOG_TIME_RE = re.compile(r'\b(?:rt|request_time|upstream_response_time)=(\d+(?:\.\d+)?)')
+LOG_TRAILING_NUMBER_RE = re.compile(r'(\d+(?:\.\d+)?)\s*$')
+
+def parse_log_line(line, time_field=None, time_unit=None):
+    """(status, server seconds) from one access log line, or None if it cannot be read
+
+    JSON lines use time_field or the first of LOG_TIME_FIELDS present. Text lines (common
+    or combined format) take the status after the quoted request and the server time
+    from an rt= / request_time= / upstream_response_time= key, always in seconds. Only
+    with time_unit is a bare last number on the line read as the duration instead (e.g.
+    Apache %D in 'us'); plain common format ends with the byte count, so such a line
+    without a keyed time is left unread rather than guessed. time_unit also scales a
+    JSON time_field, never the keyed or the default JSON fields, which have known units.
+    """
+    line = line.strip()
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        fields = [(time_field, TIME_UNITS[time_unit or 's'])] if time_field else LOG_TIME_FIELDS.items()
+        for name, scale in fields:
+            value = entry.get(name)
+            if value not in (None, '', '-'):
+                try:
+                    # upstream_response_time lists one value per upstream tried
+                    seconds = sum(float(part) for part in str(value).replace(':', ',').split(',')) * scale
+                except ValueError:
+                    return None
+                try:
+                    status = int(entry.get('status', 0))
+                except ValueError:
+                    status = 0
+                return status, seconds
+        return None
+    
+    status = LOG_STATUS_RE.search(line)
+    if not status:
+        return None
+    # The keys are nginx's own variables and always in seconds; time_unit describes the bare number
+    value = LOG_TIME_RE.search(line)
+    if value:
+        return int(status.group(1)), float(value.group(1))
+    value = LOG_TRAILING_NUMBER_RE.search(line) if time_unit else None
+    if not value:
+        return None
+    return int(status.group(1)), float(value.group(1)) * TIME_UNITS[time_unit]
+
+def join_access_log(results_file, log_file, time_field=None, time_unit=None, limit=10):
+    """Join a stored run with the target's access log through the request ids it sent
+
+    The run must have been made with request_id_header; every bot's requests carry
+    '<run_id>-<bot_id>', so the log is streamed once and lines are matched by bot id.
+    For each joined bot the slowest logged request is set against the client-side
+    latency: the gap is time the server's own timer never saw (DNS, connect, TLS,
+    load balancer and accept queues, the network). Bots with no log line at all never
+    reached the logging tier.
+    """
+    store = ResultStore.load(results_file)
+    config = store.meta.get('config', {})
+    run_id = config.get('run_id')
+    if not run_id or not config.get('request_id_header'):
+        raise ValueError(f"{results_file} was not recorded with request_id_header, nothing to join on")
+    id_re = re.compile(re.escape(run_id) + r'-(\d+)')
+    
+    rows = {bot_id: row for row, bot_id in enumerate(store.columns['bot_id'])}
+    server_time = array('d', [0.0]) * len(store)
+    server_status = array('h', [0]) * len(store)
+    hits = array('I', [0]) * len(store)
+    scanned = matched = unparsed = 0
+    with open(log_file, errors='replace') as log:
+        for line in log:
+            scanned += 1
+            if run_id not in line:
+                continue
+            match = id_re.search(line)
+            row = rows.get(int(match.group(1))) if match else None
+            if row is None:
+                continue
+            parsed = parse_log_line(line, time_field, time_unit)
+            if parsed is None:
+                unparsed += 1
+                continue
+            matched += 1
+            status, seconds = parsed
+            if not hits[row] or seconds > server_time[row]:
+                server_time[row] = seconds
+                server_status[row] = status
+            hits[row] += 1
+    
+    client_histogram, server_histogram, gap_histogram = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    joined = mismatched = negative = 0
+    slowest = []
+    latencies, statuses = store.columns['latency'], store.columns['status']
+    for row in range(len(store)):
+        if not hits[row]:
+            continue
+        joined += 1
+        client, server = latencies[row], server_time[row]
+        gap = client - server
+        if gap < 0:
+            negative += 1
+            gap = 0.0
+        client_histogram.record(client)
+        server_histogram.record(server)
+        gap_histogram.record(gap)
+        if statuses[row] != server_status[row]:
+            mismatched += 1
+        slowest.append((client, row))
+    slowest = sorted(slowest, reverse=True)[:limit]
+    
+    print(f"\n{'='*70}")
+    print(f"🔗 ACCESS LOG JOIN")
+    print(f"{'='*70}")
+    print(f"   Run: {run_id} ({len(store)} results, header {config['request_id_header']})")
+    print(f"   Log: {scanned} lines scanned, {matched} matched to this run"
+          + (f", {unparsed} without a readable status/time (log rt=$request_time or pass --time-unit)"
+             if unparsed else ''))
+    if not joined:
+        print(f"\n   No log line carried this run's request ids - is {config['request_id_header']} logged "
+              f"(e.g. $http_x_request_id in nginx log_format)?")
+        print(f"{'='*70}\n")
+        return
+    print(f"   Bots joined: {joined} of {len(store)} ({joined/len(store)*100:.1f}%)")
+    if joined < len(store):
+        print(f"   Never logged: {len(store) - joined} (dropped before the logging tier, connect errors or timeouts)")
+    if mismatched:
+        print(f"   Status differs client vs server: {mismatched} (client timeouts or a proxy answering for the app)")
+    if negative:
+        print(f"   Server time above client latency: {negative} (clock granularity or multi-request bots), gap counted as 0")
+    
+    print(f"\n   {'':8} {'Client':>10} {'Server':>10} {'Gap':>10}")
+    for percent in (50, 90, 99):
+        print(f"   {f'P{percent}':8} {client_histogram.percentile(percent):9.3f}s "
+              f"{server_histogram.percentile(percent):9.3f}s {gap_histogram.percentile(percent):9.3f}s")
+    client_median, server_median = client_histogram.percentile(50), server_histogram.percentile(50)
+    if client_median:
+        share = min(server_median / client_median, 1.0) * 100
+        print(f"\n   Server share of median latency: {share:.0f}%")
+        if share < 50:
+            print(f"   Most of the latency is outside the application: look at connect/TLS, the load balancer and network")
+        else:
+            print(f"   Most of the latency is server processing time: look at the application and its dependencies")
+    
+    print(f"\n   Slowest {len(slowest)} joined bots:")
+    print(f"   {'Request ID':28} {'Client':>9} {'Server':>9} {'Status':>11} {'Lines':>6}")
+    for client, row in slowest:
+        status = f"{statuses[row]}/{server_status[row]}"
+        print(f"   {request_id(run_id, store.columns['bot_id'][row]):28} {client:8.3f}s {server_time[row]:8.3f}s "
+              f"{status:>11} {hits[row]:6}")
+    print(f"{'='*70}\n")
+
 async def main():
     print(f"{'='*70}")
     print(f"🌐 PLAYWRIGHT LOAD TESTING TOOL")
@@ -195,6 +4013,7 @@ async def main():
     print(f"   - Real browser contexts (Chrome/Firefox/Safari)")
     print(f"   - Efficient resource usage with context reuse")
     print(f"   - Supports 100s-1000s of concurrent requests")
+    print(f"   - Optional raw HTTP engine (no browser) for server-side latency runs")
     print(f"\n📦 SETUP:")
     print(f"   pip install playwright")
     print(f"   playwright install chromium")
@@ -203,45 +4022,181 @@ async def main():
     # Configuration
     target_url = "https://aim.knust.edu.gh/"
     num_bots = 10000  # Playwright can handle much more!
+    duration = None  # e.g. 6 * 3600 to soak with max_concurrent virtual users for 6 hours (num_bots is ignored)
     max_concurrent = 1000  # Number of concurrent browser contexts
     verbose = True  # Show logs for first 5 bots
     headless = True  # Run in headless mode (faster)
+    keep_results = False  # The summary comes from the running stats; per-bot dicts would only grow memory
+    engine = 'browser'  # 'browser' (real Chromium), 'http' (pooled keep-alive client) or 'har' (replay a recorded page load)
+    har_file = 'target.har'  # Page load replayed by the 'har' engine, recorded on first use
+    har_third_party = False  # True to replay the HAR's CDN/analytics requests too (only hosts you may test!)
+    workers = 1  # Worker processes to shard bots across (each gets its own event loop + browser)
+    context_pool = True  # Recycle warm contexts/pages instead of creating one per bot
+    pool_reset = ('cookies', 'storage')  # State wiped between bots; add 'cache' for cold-cache runs
+    arrival_profile = None  # e.g. ramp_profile(10, 200, 60) for an open-model run at a target rate
+    metrics_file = None  # e.g. 'metrics.jsonl' for live per-second windows
+    metrics_port = None  # e.g. 9100 to serve Prometheus text at /metrics during the run
+    browsers = 1  # Browser instances per process; bots are spread across them
+    browser_strategy = 'round_robin'  # or 'least_loaded'
+    crash_retries = 2  # Times a bot taken down by a browser crash is requeued on the relaunched browser
+    max_browser_restarts = 10  # Relaunches per process before a crashed browser is left down
+    page_settle = 0  # e.g. 10 to read load timings, vitals and late resources after load/network idle (holds slots longer)
+    max_client_rss_mb = None  # e.g. 8000 to pause new contexts above 8GB of Chromium RSS (pip install psutil)
+    max_client_cpu = None  # e.g. 85 to pause new contexts above 85% machine CPU
+    scenario = None  # e.g. load_scenario('journey.yaml') for multi-step user journeys (browser engine)
+    warmup_requests = 0  # e.g. 200 to report the first 200 results separately from steady state
+    warmup_seconds = 0  # e.g. 30 to treat everything finishing in the first 30s as warm-up
+    # e.g. 'X-Request-ID' to tag each bot's requests for: python bots.py join-log <results> <access log>
+    # (the browser engine sends it on cross-origin requests too, which can trigger CORS preflights)
+    request_id_header = None
+    network_cohorts = None  # e.g. ['lan', {'profile': 'slow-3g', 'weight': 0.2}] to emulate slow links (browser engine)
+    url_mix = None  # e.g. 'urls.txt' ("url weight" lines), a sitemap .xml or a JSON list to spread bots over many URLs
+    results_file = f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.bin"  # Reprint with: python bots.py report <file>
     
     # Run the test
-    results = await simulate_concurrent_requests(
-        url=target_url,
-        num_bots=num_bots,
+    options = RunOptions(
         max_concurrent=max_concurrent,
         verbose=verbose,
-        headless=headless
+        headless=headless,
+        keep_results=keep_results,
+        engine=engine,
+        context_pool=context_pool,
+        pool_reset=pool_reset,
+        arrival_profile=arrival_profile,
+        metrics_file=metrics_file,
+        metrics_port=metrics_port,
+        results_file=results_file,
+        scenario=scenario,
+        max_client_rss_mb=max_client_rss_mb,
+        max_client_cpu=max_client_cpu,
+        browsers=browsers,
+        browser_strategy=browser_strategy,
+        har_file=har_file,
+        har_third_party=har_third_party,
+        duration=duration,
+        url_mix=url_mix,
+        warmup_requests=warmup_requests,
+        warmup_seconds=warmup_seconds,
+        network_cohorts=network_cohorts,
+        request_id_header=request_id_header,
+        crash_retries=crash_retries,
+        max_browser_restarts=max_browser_restarts,
+        page_settle=page_settle
     )
-    
-    # Show error details if any
-    failures = [r for r in results if not r['success']]
-    if failures:
-        print(f"\n❌ ERROR DETAILS (First 10):")
-        print("-" * 70)
-        
-        # Group errors by type
-        error_groups = {}
-        for f in failures:
-            error_msg = f.get('error', 'Unknown error')
-            # Get first line of error for grouping
-            error_type = error_msg.split('\n')[0][:80]
-            if error_type not in error_groups:
-                error_groups[error_type] = []
-            error_groups[error_type].append(f['bot_id'])
-        
-        for error_type, bot_ids in list(error_groups.items())[:10]:
-            print(f"   {error_type}")
-            print(f"   → Bots: {bot_ids[:10]}{' ...' if len(bot_ids) > 10 else ''} ({len(bot_ids)} total)")
-            print()
-        
-        if len(error_groups) > 10:
-            print(f"   ... and {len(error_groups)-10} more error types")
+    await simulate_concurrent_requests(url=target_url, num_bots=num_bots, workers=workers, options=options)
     
     print(f"\n✨ Test completed at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*70}\n")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Playwright load testing tool")
+    subparsers = parser.add_subparsers(dest='command')
+    report_parser = subparsers.add_parser('report', help="Regenerate the summary of a stored run")
+    report_parser.add_argument('results_file')
+    compare_parser = subparsers.add_parser('compare', help="Compare a run against a baseline and gate on regressions")
+    compare_parser.add_argument('baseline_file')
+    compare_parser.add_argument('current_file')
+    compare_parser.add_argument('--slo', type=parse_slo, action='append', default=[],
+                                help="Latency limit for the current run, e.g. p99=0.8 (repeatable)")
+    compare_parser.add_argument('--max-regression', type=float, default=10.0,
+                                help="Allowed percentile growth / throughput drop in percent (default 10)")
+    compare_parser.add_argument('--max-error-rate', type=float, default=None,
+                                help="Allowed failure fraction of the current run, e.g. 0.01")
+    compare_parser.add_argument('--confidence', type=float, default=0.95)
+    coordinator_parser = subparsers.add_parser('coordinator', help="Run a test spread across several agents")
+    coordinator_parser.add_argument('url')
+    coordinator_parser.add_argument('--agents', type=int, required=True, help="Number of agents to wait for")
+    coordinator_parser.add_argument('--bots', type=int, default=100)
+    coordinator_parser.add_argument('--duration', type=float, default=None, help="Soak for this many seconds instead of --bots")
+    coordinator_parser.add_argument('--url-mix', help="Weighted URL file (text, sitemap .xml or JSON) to spread bots over")
+    coordinator_parser.add_argument('--concurrency', type=int, default=50, help="Total max concurrent across agents")
+    coordinator_parser.add_argument('--engine', choices=('browser', 'http'), default='browser')
+    coordinator_parser.add_argument('--bind', default='0.0.0.0')
+    coordinator_parser.add_argument('--port', type=int, default=7700)
+    agent_parser = subparsers.add_parser('agent', help="Join a coordinator and run the bots it assigns")
+    agent_parser.add_argument('coordinator', help="HOST:PORT of the coordinator")
+    capacity_parser = subparsers.add_parser('capacity', help="Find the load level where the SLO breaks")
+    capacity_parser.add_argument('url')
+    capacity_parser.add_argument('--mode', choices=('concurrency', 'rate'), default='concurrency')
+    capacity_parser.add_argument('--start', type=float, default=10)
+    capacity_parser.add_argument('--growth', type=float, default=1.5)
+    capacity_parser.add_argument('--max-level', type=float, default=5000)
+    capacity_parser.add_argument('--slo', type=parse_slo, default=(99.0, 1.0), help="e.g. p99=1.0 (default)")
+    capacity_parser.add_argument('--max-error-rate', type=float, default=0.01)
+    capacity_parser.add_argument('--stage-duration', type=float, default=30, help="Seconds per stage in rate mode")
+    capacity_parser.add_argument('--bots-per-slot', type=int, default=5, help="Bots per concurrency slot in concurrency mode")
+    capacity_parser.add_argument('--engine', choices=('browser', 'http'), default='browser')
+    cache_parser = subparsers.add_parser('cache-compare', help="Cold vs warm browser cache page loads")
+    cache_parser.add_argument('url')
+    cache_parser.add_argument('--bots', type=int, default=50)
+    cache_parser.add_argument('--concurrency', type=int, default=10)
+    record_parser = subparsers.add_parser('record-har', help="Record one page load for the har engine")
+    record_parser.add_argument('url')
+    record_parser.add_argument('har_file')
+    join_parser = subparsers.add_parser('join-log', help="Join a stored run with the target's access log by request id")
+    join_parser.add_argument('results_file')
+    join_parser.add_argument('log_file')
+    join_parser.add_argument('--time-field', help="JSON log field holding the request duration")
+    join_parser.add_argument('--time-unit', choices=tuple(TIME_UNITS),
+                             help="Unit of the logged duration; also reads a bare trailing number as one (Apache %%D: us)")
+    serve_parser = subparsers.add_parser('serve', help="Run the local stand-in target server")
+    serve_parser.add_argument('--bind', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--latency', type=float, default=0.0, help="Seconds before each response")
+    serve_parser.add_argument('--jitter', type=float, default=0.0)
+    serve_parser.add_argument('--payload', type=int, default=2048, help="Response size in bytes")
+    serve_parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 500")
+    serve_parser.add_argument('--access-log', help="Append an nginx-style access log line per request to this file")
+    bench_parser = subparsers.add_parser('bench', help="Benchmark the tool's own overhead against a local target")
+    bench_parser.add_argument('--engines', default='http,har,browser')
+    bench_parser.add_argument('--concurrency', default='10,50,200')
+    bench_parser.add_argument('--requests', type=int, default=2000)
+    bench_parser.add_argument('--latency', type=float, default=0.0)
+    bench_parser.add_argument('--payload', type=int, default=2048)
+    bench_parser.add_argument('--output', help="Save results as JSON")
+    bench_parser.add_argument('--baseline', help="Saved results to check for throughput regressions")
+    bench_parser.add_argument('--max-regression', type=float, default=10.0)
+    args = parser.parse_args()
+    
+    if args.command == 'serve':
+        async def serve():
+            server = TargetServer(latency=args.latency, jitter=args.jitter, payload_bytes=args.payload,
+                                  error_rate=args.error_rate, access_log=args.access_log)
+            port = await server.start(args.bind, args.port)
+            print(f"🎯 Target listening on http://{args.bind}:{port}/")
+            await asyncio.Event().wait()
+        asyncio.run(serve())
+    elif args.command == 'bench':
+        failed = asyncio.run(run_benchmark(
+            engines=args.engines.split(','),
+            concurrency_levels=[int(level) for level in args.concurrency.split(',')],
+            requests=args.requests, latency=args.latency, payload_bytes=args.payload,
+            output=args.output, baseline=args.baseline, max_regression=args.max_regression))
+        sys.exit(1 if failed else 0)
+    elif args.command == 'cache-compare':
+        asyncio.run(compare_cache(args.url, num_bots=args.bots, max_concurrent=args.concurrency))
+    elif args.command == 'record-har':
+        asyncio.run(record_har(args.url, args.har_file))
+    elif args.command == 'capacity':
+        asyncio.run(find_capacity(args.url, mode=args.mode, start=args.start, growth=args.growth,
+                                  max_level=args.max_level, slo_percentile=args.slo[0], slo_latency=args.slo[1],
+                                  max_error_rate=args.max_error_rate, bots_per_slot=args.bots_per_slot,
+                                  stage_duration=args.stage_duration,
+                                  options=RunOptions(max_concurrent=1000, engine=args.engine)))
+    elif args.command == 'coordinator':
+        asyncio.run(run_coordinator(args.url, args.bots, args.agents, host=args.bind, port=args.port,
+                                    options=RunOptions(max_concurrent=args.concurrency, engine=args.engine,
+                                                       duration=args.duration, url_mix=args.url_mix)))
+    elif args.command == 'agent':
+        asyncio.run(run_agent(args.coordinator))
+    elif args.command == 'report':
+        report(args.results_file)
+    elif args.command == 'join-log':
+        join_access_log(args.results_file, args.log_file, time_field=args.time_field, time_unit=args.time_unit)
+    elif args.command == 'compare':
+        failed = compare_runs(args.baseline_file, args.current_file, slos=dict(args.slo),
+                              max_regression=args.max_regression, max_error_rate=args.max_error_rate,
+                              confidence=args.confidence)
+        sys.exit(1 if failed else 0)
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,451 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import ssl
+import struct
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import bots
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def target_url():
+    process, port = bots.start_target_process(latency=0.01)
+    yield f'http://127.0.0.1:{port}/'
+    process.terminate()
+
+
+def result(bot_id, elapsed, status=200, error=None, **extra):
+    entry = dict({'bot_id': bot_id, 'status': status, 'elapsed': elapsed,
+                  'success': isinstance(status, int) and status < 400}, **extra)
+    if error:
+        entry['error'] = error
+    return entry
+
+
+def test_histogram_percentiles_within_one_percent():
+    rng = random.Random(1)
+    values = sorted(rng.uniform(0.001, 2.0) for _ in range(20000))
+    histogram = bots.LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    for percent in (50, 90, 99, 99.9):
+        exact = values[int(len(values) * percent / 100) - 1]
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=0.01)
+    assert histogram.count == len(values)
+    assert histogram.min == values[0] and histogram.max == values[-1]
+
+
+def test_histogram_merge_and_round_trip():
+    first, second, combined = bots.LatencyHistogram(), bots.LatencyHistogram(), bots.LatencyHistogram()
+    for index in range(1000):
+        (first if index % 2 else second).record(index / 1000)
+        combined.record(index / 1000)
+    first.merge(second)
+    restored = bots.LatencyHistogram.from_dict(json.loads(json.dumps(first.to_dict())))
+    for percent in (50, 99):
+        assert restored.percentile(percent) == combined.percentile(percent)
+    assert restored.count == combined.count
+    assert restored.mean == pytest.approx(combined.mean)
+
+
+def test_arrival_times_constant_rate():
+    offsets = list(bots.arrival_times(bots.constant_profile(10, 2)))
+    assert len(offsets) == 20
+    assert offsets == pytest.approx([index / 10 for index in range(20)])
+
+
+def test_arrival_times_ramp_matches_request_count():
+    profile = bots.ramp_profile(10, 50, 10)
+    offsets = list(bots.arrival_times(profile))
+    assert len(offsets) == bots.profile_request_count(profile)
+    assert offsets == sorted(offsets)
+    # The rate ramps up, so the second half of the profile holds most requests
+    assert sum(offset >= 5 for offset in offsets) > sum(offset < 5 for offset in offsets)
+
+
+def test_result_store_round_trip(tmp_path):
+    path = str(tmp_path / 'run.bin')
+    store = bots.ResultStore(path, flush_every=2)
+    store.write_meta(config={'run_id': 'abc'})
+    store.record(result(1, 0.1))
+    store.record(result(2, 0.2, status='Error', error='net::ERR_CONNECTION_REFUSED at https://x'))
+    store.record(result(3, 0.3, status=503, warmup=True))
+    store.close()
+
+    loaded = bots.ResultStore.load(path)
+    assert len(loaded) == 3
+    assert list(loaded.columns['bot_id']) == [1, 2, 3]
+    assert list(loaded.columns['latency']) == pytest.approx([0.1, 0.2, 0.3])
+    assert list(loaded.columns['success']) == [1, 0, 0]
+    assert list(loaded.columns['flags']) == [0, 0, bots.ResultStore.WARMUP]
+    assert loaded.statuses() == [200, 'Error', 503]
+    assert loaded.errors[loaded.columns['error_id'][1]] == 'connect_refused'
+    assert loaded.meta['config'] == {'run_id': 'abc'}
+
+
+def test_result_store_overwrite_replaces_previous_run(tmp_path):
+    path = str(tmp_path / 'run.bin')
+    for bot_ids in (range(1, 6), range(1, 3)):
+        store = bots.ResultStore(path, overwrite=True)
+        for bot_id in bot_ids:
+            store.record(result(bot_id, 0.1))
+        store.close()
+    assert len(bots.ResultStore.load(path)) == 2
+
+
+def test_result_store_loads_legacy_format(tmp_path):
+    path = tmp_path / 'old.bin'
+    columns = bots.ResultStore.LEGACY_FORMATS[b'BOTSRUN1']
+    values = {'bot_id': [1, 2], 'ts': [10.0, 11.0], 'latency': [0.5, 0.7], 'status': [200, 500],
+              'error_id': [0, 1], 'success': [1, 0]}
+    payload = struct.pack('<I', 2) + b''.join(array(code, values[name]).tobytes() for name, code in columns)
+    errors = json.dumps(['http_5xx']).encode()
+    path.write_bytes(b'BOTSRUN1' + b'S' + struct.pack('<I', len(errors)) + errors
+                     + b'D' + struct.pack('<I', len(payload)) + payload)
+
+    loaded = bots.ResultStore.load(str(path))
+    assert list(loaded.columns['latency']) == [0.5, 0.7]
+    assert list(loaded.columns['flags']) == [0, 0]
+    assert loaded.errors[loaded.columns['error_id'][1]] == 'http_5xx'
+
+
+@pytest.mark.parametrize('error, category', [
+    (socket.gaierror(-2, 'Name or service not known'), 'dns'),
+    (ConnectionRefusedError(111, 'Connection refused'), 'connect_refused'),
+    (ConnectionResetError(104, 'Connection reset by peer'), 'connect_reset'),
+    (asyncio.IncompleteReadError(b'', 10), 'connect_reset'),
+    (ssl.SSLCertVerificationError('certificate verify failed'), 'tls'),
+    (TimeoutError(), 'timeout'),
+    ('net::ERR_NAME_NOT_RESOLVED at https://shop.test/', 'dns'),
+    ('net::ERR_CERT_AUTHORITY_INVALID at https://shop.test/', 'tls'),
+    ('Timeout 30000ms exceeded.\n=========================== logs\nnavigating to "https://shop.test/"',
+     'navigation_timeout'),
+    ('Timeout 5000ms exceeded waiting for selector "#buy"', 'timeout'),
+    ('Target page, context or browser has been closed', 'browser_crash'),
+    ('net::ERR_TOO_MANY_REDIRECTS', 'too_many_redirects'),
+    ('something unexpected', 'other'),
+])
+def test_classify_error(error, category):
+    assert bots.classify_error(error) == category
+
+
+def test_error_type_of_results():
+    assert bots.error_type(result(1, 0.1, status=503)) == 'http_5xx'
+    assert bots.error_type(result(1, 0.1, status=404)) == 'http_4xx'
+    assert bots.error_type(result(1, 0.1, status='No Response')) == 'no_response'
+    assert bots.error_type(result(1, 0.1, status='Error', error='net::ERR_CONNECTION_RESET')) == 'connect_reset'
+    assert bots.error_type(result(1, 0.1, status='Error', error='x', error_type='browser_crash')) == 'browser_crash'
+
+
+@pytest.mark.parametrize('url, pattern', [
+    ('https://shop.test/products/123?ref=x', 'shop.test/products/{id}?ref'),
+    ('https://shop.test/', 'shop.test/'),
+    ('https://shop.test/u/550e8400-e29b-41d4-a716-446655440000/orders', 'shop.test/u/{id}/orders'),
+    ('https://shop.test/search?q=a&page=2', 'shop.test/search?page&q'),
+])
+def test_url_pattern(url, pattern):
+    assert bots.url_pattern(url) == pattern
+
+
+def test_url_patterns_past_the_cap_share_other():
+    stats, other = bots.RunStats(), bots.RunStats()
+    stats.MAX_PATTERNS = other.MAX_PATTERNS = 2
+    for section in ('a', 'b', 'c', 'd'):
+        stats.record_target(f'https://shop.test/{section}/1', 0.1, success=section != 'd')
+    assert set(stats.pattern_histograms) == {'shop.test/a/{id}', 'shop.test/b/{id}', '(other)'}
+    assert stats.pattern_histograms['(other)'].count == 2
+    assert stats.pattern_errors == {'(other)': 1}
+
+    other.record_target('https://shop.test/a/2', 0.2, success=False)
+    other.record_target('https://shop.test/e/1', 0.2, success=False)
+    stats.merge(other)
+    assert stats.pattern_histograms['shop.test/a/{id}'].count == 2
+    assert stats.pattern_histograms['(other)'].count == 3
+    assert stats.pattern_errors == {'shop.test/a/{id}': 1, '(other)': 2}
+
+
+@pytest.mark.parametrize('line, kwargs, expected', [
+    ('1.2.3.4 - - [x] "GET / HTTP/1.1" 200 48213 "-" "-" rid=a-1 rt=0.012', {}, (200, 0.012)),
+    ('1.2.3.4 - - [x] "GET / HTTP/1.1" 200 48213', {}, None),
+    ('1.2.3.4 - - [x] "GET / HTTP/1.1" 404 12 "-" "-" 1500', {'time_unit': 'us'}, (404, 0.0015)),
+    # A keyed time stays in seconds whatever unit the bare number would have
+    ('1.2.3.4 - - [x] "GET / HTTP/1.1" 200 48213 "-" "-" rt=0.012', {'time_unit': 'ms'}, (200, 0.012)),
+    ('{"status": "502", "upstream_response_time": "0.010, 0.020"}', {}, (502, 0.03)),
+    ('{"status": 200, "latency": 12}', {'time_field': 'latency', 'time_unit': 'ms'}, (200, 0.012)),
+    ('{"status": 200}', {}, None),
+])
+def test_parse_log_line(line, kwargs, expected):
+    parsed = bots.parse_log_line(line, **kwargs)
+    if expected is None:
+        assert parsed is None
+    else:
+        assert parsed[0] == expected[0]
+        assert parsed[1] == pytest.approx(expected[1])
+
+
+class FakeResponse:
+    status = 200
+
+
+class FakeBrowser:
+    """Just enough of a Playwright browser for send_request; crashes after crash_after navigations"""
+    def __init__(self, crash_after=None):
+        self.crash_after = crash_after
+        self.navigations = 0
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    def check(self):
+        if not self.connected:
+            raise RuntimeError('Target page, context or browser has been closed')
+
+    async def new_context(self, **kwargs):
+        self.check()
+        return FakeContext(self)
+
+    async def close(self):
+        self.connected = False
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def add_init_script(self, script):
+        self.browser.check()
+
+    async def new_page(self):
+        self.browser.check()
+        return FakePage(self.browser)
+
+    async def set_extra_http_headers(self, headers):
+        self.browser.check()
+
+    async def clear_cookies(self):
+        self.browser.check()
+
+    async def close(self):
+        pass
+
+
+class FakePage:
+    url = 'http://target.test/'
+
+    def __init__(self, browser):
+        self.browser = browser
+
+    def on(self, event, callback):
+        pass
+
+    def remove_listener(self, event, callback):
+        pass
+
+    async def goto(self, url, **kwargs):
+        self.browser.check()
+        self.browser.navigations += 1
+        await asyncio.sleep(0.01)
+        if self.browser.crash_after and self.browser.navigations >= self.browser.crash_after:
+            self.browser.connected = False
+        self.browser.check()
+        return FakeResponse()
+
+    async def evaluate(self, script):
+        self.browser.check()
+        return {'title': 'Fake', 'timing': {}, 'vitals': None, 'resources': []}
+
+
+def run_crashing_browser(launch, max_restarts):
+    """40 bots, 5 at a time, on one pooled browser that crashes after 10 navigations"""
+    async def run():
+        browser = FakeBrowser(crash_after=10)
+        pool = bots.ContextPool(browser, 5)
+        await pool.start()
+        browser_set = bots.BrowserSet([browser], pools=[pool], launch=launch, max_retries=1,
+                                      max_restarts=max_restarts)
+        tracker = bots.ProgressTracker(40)
+        slots = asyncio.Semaphore(5)
+
+        async def bot(bot_id):
+            async with slots:
+                return await browser_set.send('http://target.test/', bot_id, tracker)
+
+        results = await asyncio.wait_for(asyncio.gather(*(bot(bot_id) for bot_id in range(1, 41))), 10)
+        return results, browser_set
+
+    return asyncio.run(run())
+
+
+def test_crashed_browser_is_relaunched_and_its_bots_requeued():
+    async def launch():
+        return FakeBrowser()
+
+    results, browser_set = run_crashing_browser(launch, max_restarts=1)
+    assert len(results) == 40
+    assert all(entry['success'] for entry in results)
+    assert browser_set.browsers[0].is_connected()
+    assert browser_set.crash_stats['crashes'] == 1 and browser_set.crash_stats['restarts'] == 1
+    assert 0 < browser_set.crash_stats['requeued'] == sum(entry.get('attempts', 1) - 1 for entry in results)
+
+
+def test_browser_left_down_past_restart_budget_fails_its_bots():
+    async def launch():
+        raise AssertionError('no restarts left, nothing to relaunch')
+
+    results, browser_set = run_crashing_browser(launch, max_restarts=0)
+    crash_stats = browser_set.crash_stats
+    failed = [entry for entry in results if not entry['success']]
+    assert len(results) == 40
+    assert 0 < len(failed) < 40
+    assert {bots.error_type(entry) for entry in failed} == {'browser_crash'}
+    assert crash_stats['crashes'] == 1 and crash_stats['restarts'] == 0
+    assert crash_stats['abandoned'] == len(failed)
+
+
+def test_simulate_accepts_run_option_keywords():
+    async def run():
+        target = bots.TargetServer(latency=0.001)
+        port = await target.start()
+        try:
+            results = await bots.simulate_concurrent_requests(f'http://127.0.0.1:{port}/', 20, max_concurrent=5,
+                                                              engine='http')
+            with pytest.raises(TypeError, match='max_concurent'):
+                await bots.simulate_concurrent_requests(f'http://127.0.0.1:{port}/', 20, max_concurent=5)
+        finally:
+            await target.close()
+        return results
+
+    results = asyncio.run(run())
+    assert len(results) == 20 and all(entry['success'] for entry in results)
+
+
+@pytest.mark.parametrize('num_bots, workers, max_concurrent', [(100, 3, 50), (10, 4, 10), (3, 4, 8), (1000, 8, 5)])
+def test_plan_shards_splits_exactly(num_bots, workers, max_concurrent):
+    shards, shard_options = bots.plan_shards(num_bots, workers, bots.RunOptions(max_concurrent=max_concurrent,
+                                                                                  warmup_requests=10))
+    assert [bot_id for shard in shards for bot_id in shard] == list(range(1, num_bots + 1))
+    assert len(shard_options) == len(shards) == min(num_bots, workers)
+    concurrency = [options.max_concurrent for options in shard_options]
+    assert max(concurrency) - min(concurrency) <= 1
+    assert sum(concurrency) == max(max_concurrent, len(shards))
+    assert sum(options.warmup_requests for options in shard_options) == 10
+
+
+def test_sharded_run_merges_workers(target_url):
+    results, stats, total_time = bots.run_sharded(target_url, 40, 2, bots.RunOptions(max_concurrent=5, engine='http'))
+    assert [entry['bot_id'] for entry in results] == list(range(1, 41))
+    assert stats.successful == 40
+    # Four rounds of 10ms requests per worker, not the seconds it takes to spawn them
+    assert 0.04 <= total_time < 1
+
+
+def test_sharded_run_fails_when_a_worker_dies(target_url):
+    before = set(multiprocessing.active_children())
+    options = bots.RunOptions(max_concurrent=4, engine='http', duration=60)
+    with ThreadPoolExecutor(1) as executor:
+        started = time.time()
+        run = executor.submit(bots.run_sharded, target_url, None, 2, options)
+        while not set(multiprocessing.active_children()) - before:
+            time.sleep(0.05)
+        time.sleep(1)
+        os.kill(next(iter(set(multiprocessing.active_children()) - before)).pid, signal.SIGKILL)
+        with pytest.raises(RuntimeError, match='without reporting'):
+            run.result(timeout=30)
+    assert time.time() - started < 30
+
+
+def test_target_server_closes_keep_alive_connections_quietly(caplog):
+    async def run():
+        target = bots.TargetServer()
+        port = await target.start()
+        client = bots.HttpClientPool()
+        for _ in range(3):
+            await client.request(f'http://127.0.0.1:{port}/')
+        await target.close()
+        await client.close()
+        return target
+
+    target = asyncio.run(run())
+    assert target.requests == 3 and not target.handlers
+    assert not [record for record in caplog.records if record.name == 'asyncio']
+
+
+def test_har_plan_keeps_the_page_origin(tmp_path):
+    har_file = tmp_path / 'page.har'
+    bots.write_synthetic_har(str(har_file), 'https://shop.test/', assets=2)
+    har = json.loads(har_file.read_text())
+    extra = dict(har['log']['entries'][-1], request={'method': 'GET', 'url': 'https://cdn.test/lib.js'})
+    har['log']['entries'].append(extra)
+    har_file.write_text(json.dumps(har))
+
+    plan = bots.load_har_plan(str(har_file))
+    assert [entry['url'] for entry in plan] == ['https://shop.test/', 'https://shop.test/asset/0',
+                                                'https://shop.test/asset/1']
+    assert plan[1]['deps'] == [0]
+    assert len(bots.load_har_plan(str(har_file), third_party=True)) == 4
+
+
+def test_har_engine_replays_the_page_per_bot(tmp_path):
+    async def run():
+        target = bots.TargetServer(latency=0.001)
+        port = await target.start()
+        url = f'http://127.0.0.1:{port}/'
+        har_file = str(tmp_path / 'page.har')
+        bots.write_synthetic_har(har_file, url, assets=3)
+        stats = bots.RunStats()
+        try:
+            results = await bots.run_bots(url, range(1, 21), bots.ProgressTracker(20), stats,
+                                          options=bots.RunOptions(max_concurrent=5, engine='har', har_file=har_file))
+        finally:
+            await target.close()
+        return results, stats, target.requests
+
+    results, stats, served = asyncio.run(run())
+    assert len(results) == 20 and stats.successful == 20
+    assert served == 20 * 4
+
+
+@pytest.mark.parametrize('with_url_mix', [False, True])
+def test_coordinator_with_two_agents(tmp_path, with_url_mix):
+    async def run():
+        target = bots.TargetServer(latency=0.001)
+        target_port = await target.start()
+        port = free_port()
+        url_mix = None
+        if with_url_mix:
+            # A path: the coordinator reads it, agents get the weighted list
+            url_mix = tmp_path / 'urls.txt'
+            url_mix.write_text(f'http://127.0.0.1:{target_port}/a 3\nhttp://127.0.0.1:{target_port}/b 1\n')
+            url_mix = str(url_mix)
+        try:
+            coordinator = asyncio.create_task(bots.run_coordinator(
+                f'http://127.0.0.1:{target_port}/', 60, 2, host='127.0.0.1', port=port, start_delay=0.2,
+                options=bots.RunOptions(max_concurrent=10, engine='http', url_mix=url_mix)))
+            await asyncio.sleep(0.2)
+            agents = [asyncio.create_task(bots.run_agent(f'127.0.0.1:{port}')) for _ in range(2)]
+            stats = await asyncio.wait_for(coordinator, 60)
+            await asyncio.gather(*agents)
+        finally:
+            await target.close()
+        return stats, target.requests
+
+    stats, served = asyncio.run(run())
+    assert stats.total == 60
+    assert stats.successful == 60
+    assert served == 60